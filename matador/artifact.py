@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+import hashlib
+import json
+import threading
+import time
+import zipfile
+from pathlib import Path, PurePosixPath
+
+MANIFEST = 'manifest.json'
+CHUNK_SIZE = 64 * 1024
+
+
+def _script_key(script_path, commit_ref):
+    return '%s:%s' % (commit_ref, PurePosixPath(script_path).as_posix())
+
+
+class ArtifactWriter(object):
+
+    """Writes the files for deploying a package to a zip archive.
+
+    A manifest listing the path, size and SHA-256 hash of every file, along
+    with the scripts each deployment fetches, is added when the archive is
+    closed. The archive's own directory allows any file to be read without
+    reading the others.
+
+    Parameters
+    ----------
+    path : pathlib.Path
+    metadata
+        Values to include in the manifest, e.g. the package and commit
+    """
+
+    def __init__(self, path, **metadata):
+        self.path = Path(path)
+        self.manifest = dict(metadata, files={}, scripts={})
+        self._zip = zipfile.ZipFile(
+            str(self.path), 'w', compression=zipfile.ZIP_DEFLATED)
+
+    def add_file(self, source, name):
+        """Add a file to the archive under a given name
+
+        Parameters
+        ----------
+        source : pathlib.Path
+        name : str
+            The path within the archive, using '/' as the separator
+        """
+        sha = hashlib.sha256()
+        size = 0
+        with source.open('rb') as f, self._zip.open(name, 'w') as target:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                sha.update(chunk)
+                size += len(chunk)
+                target.write(chunk)
+            f.close()
+        self.manifest['files'][name] = {
+            'size': size, 'sha256': sha.hexdigest()}
+
+    def add_folder(self, folder, prefix):
+        """Add every file in a folder beneath a prefix
+
+        Parameters
+        ----------
+        folder : pathlib.Path
+        prefix : str
+        """
+        for source in sorted(folder.rglob('*')):
+            if source.is_file():
+                self.add_file(
+                    source,
+                    '%s/%s' % (prefix, source.relative_to(folder).as_posix()))
+
+    def add_script(self, source, script_path, commit_ref, commit_id):
+        """Add a script as rendered for deployment at a given ref
+
+        Parameters
+        ----------
+        source : pathlib.Path
+            The rendered script
+        script_path : pathlib.Path
+            Its path within the repository
+        commit_ref : str
+            The ref at which the deployment fetches it
+        commit_id : str
+            The id of the commit to which the ref resolved
+        """
+        key = _script_key(script_path, commit_ref)
+        name = 'scripts/%s/%s' % (
+            commit_id, PurePosixPath(script_path).as_posix())
+        if name not in self.manifest['files']:
+            self.add_file(source, name)
+        self.manifest['scripts'][key] = {'file': name, 'commit': commit_id}
+
+    def close(self):
+        self.manifest['created'] = time.strftime(
+            '%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        self._zip.writestr(
+            MANIFEST, json.dumps(self.manifest, indent=2, sort_keys=True))
+        self._zip.close()
+
+
+class Artifact(object):
+
+    """A package built for deployment, read from its archive.
+
+    Every file extracted is checked against the size and hash recorded for it
+    in the manifest.
+
+    Parameters
+    ----------
+    path : pathlib.Path
+
+    Attributes
+    ----------
+    manifest : dict
+    project : str
+    package : str
+    commit_id : str
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._zip = zipfile.ZipFile(str(self.path), 'r')
+        self.manifest = json.loads(self._zip.read(MANIFEST).decode('UTF-8'))
+        self.project = self.manifest['project']
+        self.package = self.manifest['package']
+        self.commit_id = self.manifest['commit']
+
+    def _extract(self, name, target):
+        entry = self.manifest['files'][name]
+        Path.mkdir(target.parent, parents=True, exist_ok=True)
+        if target.exists():
+            target.unlink()
+        sha = hashlib.sha256()
+        size = 0
+        with self._lock:
+            with self._zip.open(name) as source, target.open('wb') as f:
+                for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                    sha.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+                f.close()
+        if size != entry['size'] or sha.hexdigest() != entry['sha256']:
+            target.unlink()
+            raise ValueError('%s in %s does not match its manifest' % (
+                name, self.path))
+
+    def extract_folder(self, prefix, target_folder):
+        """Write the files beneath a prefix in the archive to a folder
+
+        Parameters
+        ----------
+        prefix : str
+            e.g. 'tickets/A001'
+        target_folder : pathlib.Path
+        """
+        prefix = prefix.rstrip('/') + '/'
+        names = [
+            name for name in self.manifest['files']
+            if name.startswith(prefix)]
+        if not names:
+            raise KeyError('Not found in %s: %s' % (self.path, prefix))
+        for name in names:
+            self._extract(name, Path(target_folder, name[len(prefix):]))
+
+    def script_commit(self, script_path, commit_ref):
+        """The id of the commit from which a script was rendered
+
+        Parameters
+        ----------
+        script_path : pathlib.Path
+        commit_ref : str
+
+        Returns
+        -------
+        str
+        """
+        return self._script(script_path, commit_ref)['commit']
+
+    def _script(self, script_path, commit_ref):
+        key = _script_key(script_path, commit_ref)
+        try:
+            return self.manifest['scripts'][key]
+        except KeyError:
+            raise KeyError(
+                '%s at %s was not included in %s' % (
+                    script_path, commit_ref, self.path))
+
+    def extract_script(self, script_path, commit_ref, target_folder):
+        """Write a rendered script to a folder
+
+        Parameters
+        ----------
+        script_path : pathlib.Path
+            The script's path within the repository
+        commit_ref : str
+            The ref at which the deployment fetches it
+        target_folder : pathlib.Path
+
+        Returns
+        -------
+        pathlib.Path
+            The script written
+        """
+        target_script = Path(target_folder, PurePosixPath(script_path).name)
+        self._extract(
+            self._script(script_path, commit_ref)['file'], target_script)
+        return target_script
+
+    def close(self):
+        self._zip.close()
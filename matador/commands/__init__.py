@@ -1,25 +1,118 @@
-from .run_sql_script import RunSqlScript
-from .deploy_ticket import DeployTicket, RemoveTicket
-from .deploy_package import DeployPackage, RemovePackage
-from .create import CreateTicket, CreatePackage, AddTicketToPackage
+from collections.abc import Mapping
+from importlib import import_module
 import os
 
-commands = {
-    'run-sql-script': RunSqlScript,
-    'deploy-ticket': DeployTicket,
-    'remove-ticket': RemoveTicket,
-    'deploy-package': DeployPackage,
-    'remove-package': RemovePackage,
-    'create-ticket': CreateTicket,
-    'create-package': CreatePackage,
-    'add-t2p': AddTicketToPackage,
+# Each command's class is named by its dotted path and only imported when the
+# command is run, so that starting matador does not import every command's
+# dependencies.
+_builtin_commands = {
+    'run-sql-script': 'matador.commands.run_sql_script:RunSqlScript',
+    'deploy-ticket': 'matador.commands.deploy_ticket:DeployTicket',
+    'remove-ticket': 'matador.commands.deploy_ticket:RemoveTicket',
+    'deploy-package': 'matador.commands.deploy_package:DeployPackage',
+    'remove-package': 'matador.commands.deploy_package:RemovePackage',
+    'create-ticket': 'matador.commands.create:CreateTicket',
+    'create-package': 'matador.commands.create:CreatePackage',
+    'add-t2p': 'matador.commands.create:AddTicketToPackage',
+    'batch': 'matador.commands.batch:Batch',
+    'cache': 'matador.commands.cache:Cache',
+    'build-package': 'matador.commands.artifact:BuildPackage',
+    'deploy-artifact': 'matador.commands.artifact:DeployArtifact',
 }
 
 if os.name == 'nt':
-    from .abw_service import (
-        StartService, StopService, RestartService, ServiceStatus)
+    _builtin_commands.update({
+        'start-service': 'matador.commands.abw_service:StartService',
+        'stop-service': 'matador.commands.abw_service:StopService',
+        'restart-service': 'matador.commands.abw_service:RestartService',
+        'service-status': 'matador.commands.abw_service:ServiceStatus',
+    })
 
-    commands['start-service'] = StartService
-    commands['stop-service'] = StopService
-    commands['restart-service'] = RestartService
-    commands['service-status'] = ServiceStatus
+ENTRY_POINT_GROUP = 'matador.commands'
+
+
+def _entry_points():
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        return []
+    try:
+        return list(entry_points(group=ENTRY_POINT_GROUP))
+    except TypeError:
+        return list(entry_points().get(ENTRY_POINT_GROUP, []))
+
+
+def _import_class(path):
+    module_name, class_name = path.split(':')
+    return getattr(import_module(module_name), class_name)
+
+
+class CommandRegistry(Mapping):
+
+    """The commands matador can run, mapped from their names to their classes.
+
+    Built in commands are listed by the dotted paths of their classes and
+    other packages may add commands through entry points in the
+    'matador.commands' group. A command's class is imported the first time
+    it is looked up.
+
+    Parameters
+    ----------
+    paths : dict
+        The 'module:class' path of each command's class, by name
+    """
+
+    def __init__(self, paths):
+        self._paths = dict(paths)
+        self._classes = {}
+        self._entry_points = None
+
+    def _plugins(self):
+        if self._entry_points is None:
+            self._entry_points = {
+                entry_point.name: entry_point
+                for entry_point in _entry_points()
+                if entry_point.name not in self._paths}
+        return self._entry_points
+
+    def __getitem__(self, name):
+        try:
+            return self._classes[name]
+        except KeyError:
+            pass
+        if name in self._paths:
+            command = _import_class(self._paths[name])
+        elif name in self._plugins():
+            command = self._plugins()[name].load()
+        else:
+            raise KeyError(name)
+        self._classes[name] = command
+        return command
+
+    def __contains__(self, name):
+        return name in self._paths or name in self._plugins()
+
+    def __iter__(self):
+        yield from self._paths
+        yield from self._plugins()
+
+    def __len__(self):
+        return len(self._paths) + len(self._plugins())
+
+    def register(self, name, path):
+        """Add a command, given the 'module:class' path of its class"""
+        self._paths[name] = path
+        self._classes.pop(name, None)
+
+
+commands = CommandRegistry(_builtin_commands)
+
+
+def __getattr__(name):
+    # Keep the command classes available as attributes of this package,
+    # e.g. matador.commands.DeployTicket, without importing them up front.
+    for path in _builtin_commands.values():
+        if path.split(':')[1] == name:
+            return _import_class(path)
+    raise AttributeError(
+        'module %r has no attribute %r' % (__name__, name))
@@ -1,5 +1,4 @@
 from .command import Command
-from matador.session import Session
 import win32serviceutil as win32
 
 
@@ -34,8 +33,9 @@ class ActionService(Command):
             help='Agresso service label')
 
     def _execute(self):
-        self.server = Session.environments[self.args.environment]['abwServer']
-        self.services = Session.environments[self.args.environment]['services']
+        environment = self.session.environments[self.args.environment]
+        self.server = environment['abwServer']
+        self.services = environment['services']
 
 
 class StartService(ActionService):
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+from .command import Command
+from .run_sql_script import (
+    add_execution_arguments, set_execution_options)
+from .deploy_package import (
+    DeployPackage, add_deployment_arguments, read_tickets)
+from matador.artifact import Artifact, ArtifactWriter
+from matador.commands.deployment.deploy_sql_script import (
+    referenced_scripts, render_script)
+from matador.session import Session
+from matador import git
+from pathlib import Path
+import shutil
+import tempfile
+import yaml
+
+
+class BuildPackage(Command):
+
+    """Builds an archive from which a package can be deployed without git.
+
+    The package's folder, each of its tickets' folders and every script
+    their deployment files fetch from the repository, with keywords
+    substituted, are written to a zip archive along with a manifest. Only
+    scripts named by literal arguments to DeploySqlScript and
+    DeployOraclePackage can be found and included, so the build fails if a
+    deployment file calls either with any other arguments.
+    """
+
+    def _add_arguments(self, parser):
+        parser.prog = 'matador build-package'
+        parser.add_argument(
+            '-p', '--package',
+            type=str,
+            required=True,
+            help='Package name')
+
+        parser.add_argument(
+            '-c', '--commit',
+            type=str,
+            default='none',
+            help='Commit or tag ID')
+
+        parser.add_argument(
+            '-o', '--output',
+            type=str,
+            default=None,
+            help='The archive to write, by default <package>-<commit>.zip')
+
+    def _add_scripts(self, writer, deploy_file, folder, rendered):
+        repo = self.session.matador_repo
+        unresolved = []
+        scripts = referenced_scripts(deploy_file, unresolved)
+        if unresolved:
+            # The deployment would fail for want of the scripts, so the
+            # artifact is not built at all.
+            raise ValueError(
+                'Cannot tell which scripts %s fetches, since the arguments '
+                'are not literal strings: %s' % (
+                    deploy_file.relative_to(folder).as_posix(),
+                    '; '.join(unresolved)))
+        for script_path, commit_ref in scripts:
+            if (script_path, commit_ref) in rendered:
+                continue
+            target_folder = Path(folder, 'scripts', str(len(rendered)))
+            Path.mkdir(target_folder, parents=True)
+            script = render_script(
+                repo, script_path, commit_ref, target_folder,
+                self.session.script_cache())
+            commit_id = git.resolve_commit(
+                repo, commit_ref).decode(encoding='ascii')
+            writer.add_script(script, script_path, commit_ref, commit_id)
+            rendered.add((script_path, commit_ref))
+
+    def _execute(self):
+        package = self.args.package
+        if self.args.commit == 'none':
+            commit = None
+        else:
+            commit = self.args.commit
+
+        self.session.update_repository()
+        repo = self.session.matador_repo
+        commit_id = git.resolve_commit(repo, commit).decode(encoding='ascii')
+
+        if self.args.output is None:
+            output = Path('%s-%s.zip' % (package, commit_id[:7]))
+        else:
+            output = Path(self.args.output)
+
+        with tempfile.TemporaryDirectory() as folder:
+            package_folder = Path(folder, 'package')
+            git.export_tree(
+                repo, commit_id, 'deploy/packages/' + package, package_folder)
+            with Path(package_folder, 'tickets.yml').open('r') as f:
+                tickets, dependencies = read_tickets(yaml.load(f))
+                f.close()
+
+            tickets_folder = Path(folder, 'tickets')
+            git.export_subtrees(
+                repo, commit_id, 'deploy/tickets', tickets, tickets_folder)
+
+            writer = ArtifactWriter(
+                output, project=self.session.project, package=package,
+                commit=commit_id, tickets=tickets)
+            try:
+                writer.add_folder(package_folder, 'package')
+                deploy_files = [Path(package_folder, 'remove.py')]
+                for ticket in tickets:
+                    writer.add_folder(
+                        Path(tickets_folder, ticket), 'tickets/' + ticket)
+                    deploy_files.append(
+                        Path(tickets_folder, ticket, 'deploy.py'))
+
+                rendered = set()
+                for deploy_file in deploy_files:
+                    if deploy_file.exists():
+                        self._add_scripts(
+                            writer, deploy_file, folder, rendered)
+                writer.close()
+            except BaseException:
+                writer.close()
+                output.unlink()
+                raise
+
+        self._logger.info('Built %s for %s at %s with %d file(s)' % (
+            output, package, commit_id, len(writer.manifest['files'])))
+
+
+class DeployArtifact(DeployPackage):
+
+    """Deploys a package from an archive made by build-package.
+
+    Nothing is fetched from or checked out of a repository. The project's
+    environments.yml and credentials.yml are read from the config folder.
+    """
+
+    project_session = False
+
+    def _add_arguments(self, parser):
+        parser.prog = 'matador deploy-artifact'
+        parser.add_argument(
+            '-e', '--environment',
+            type=str,
+            required=True,
+            help='Agresso environment name, or several separated by commas')
+
+        parser.add_argument(
+            '-a', '--artifact',
+            type=str,
+            required=True,
+            help='The archive built by build-package')
+
+        parser.add_argument(
+            '--config',
+            type=str,
+            default=None,
+            help='The folder holding environments.yml and credentials.yml')
+
+        parser.add_argument(
+            '-i', '--incremental',
+            action='store_true',
+            help='Skip scripts already run successfully as they stand')
+
+        add_execution_arguments(parser)
+        add_deployment_arguments(parser)
+
+    def _create_session(self):
+        artifact = Artifact(self.args.artifact)
+        artifact.close()
+        return Session(
+            project=artifact.project,
+            config_folder=Path(self.args.config or 'config'))
+
+    @staticmethod
+    def _checkout_package(session, package, commit_id):
+        package_folder = Path(session.matador_packages_folder, package)
+        shutil.rmtree(str(package_folder), ignore_errors=True)
+        session.artifact.extract_folder('package', package_folder)
+        return package_folder
+
+    def _checkout_tickets(self, session, tickets):
+        for ticket in tickets:
+            ticket_folder = Path(session.matador_tickets_folder, ticket)
+            shutil.rmtree(str(ticket_folder), ignore_errors=True)
+            session.artifact.extract_folder('tickets/' + ticket, ticket_folder)
+
+    def _prepare_ticket(self, session, ticket):
+        self._checkout_tickets(session, [ticket])
+
+    def _execute(self):
+        artifact = Artifact(self.args.artifact)
+        environments = self.args.environment.split(',')
+        set_execution_options(self.session, self.args)
+        self.session.incremental = self.args.incremental
+        self.args.package = artifact.package
+        self.commit_id = artifact.commit_id
+        self.session.commit_id = artifact.commit_id
+        self.session.artifact = artifact
+        try:
+            self._execute_environments(environments)
+        finally:
+            artifact.close()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+from .command import Command
+from pathlib import Path
+import time
+import yaml
+
+
+def read_plan(entries, commands=None):
+    """Read the steps of a release plan
+
+    Each entry in the plan maps a command name to its arguments, named as
+    they are on the command line but without the leading dashes:
+
+        - deploy-ticket:
+            environment: test
+            ticket: A001
+        - run-sql-script:
+            environment: test
+            directory: scripts
+            file: refresh.sql
+
+    Parameters
+    ----------
+    entries : list
+        The contents of the plan file
+    commands : dict
+        If given, the classes of the commands which may be run, by name,
+        against which each step is checked
+
+    Returns
+    -------
+    list
+        The command name and a dict of its arguments for each step
+    """
+    steps = []
+    for number, entry in enumerate(entries or [], 1):
+        if not isinstance(entry, dict) or len(entry) != 1:
+            raise ValueError(
+                'Step %d should name one command and its arguments' % number)
+        (name, arguments), = entry.items()
+        arguments = {
+            key.replace('-', '_'): value
+            for key, value in (arguments or {}).items()}
+        if commands is not None:
+            if name not in commands or name == 'batch':
+                raise ValueError(
+                    'Step %d: unknown command %s' % (number, name))
+            # Arguments given to a command directly bypass its parser, so
+            # check here that each is one it knows and none it requires are
+            # missing.
+            known = commands[name].arguments()
+            unknown = [
+                argument for argument in arguments if argument not in known]
+            if unknown:
+                raise ValueError('Step %d: %s has no argument %s' % (
+                    number, name, ', '.join(
+                        argument.replace('_', '-') for argument in unknown)))
+            missing = [
+                argument
+                for argument in commands[name].required_arguments()
+                if argument not in arguments]
+            if missing:
+                raise ValueError('Step %d: %s requires %s' % (
+                    number, name, ', '.join(missing)))
+        steps.append((name, arguments))
+    return steps
+
+
+class Batch(Command):
+
+    """Runs the commands in a release plan one after another.
+
+    Every step shares the session of the batch, so the repositories, the
+    configuration and the database connections are opened only once. Steps
+    which do not run against the project repository, such as
+    deploy-artifact, create their own sessions instead. The batch stops at
+    the first step to fail.
+    """
+
+    def _add_arguments(self, parser):
+        parser.prog = 'matador batch'
+        parser.add_argument(
+            'plan',
+            type=str,
+            help='The YAML file listing the commands to run')
+
+    def _steps(self):
+        from matador.commands import commands
+
+        if getattr(self, '_plan', None) is None:
+            with Path(self.args.plan).open('r') as f:
+                self._plan = read_plan(yaml.load(f), commands)
+                f.close()
+        return self._plan
+
+    def _create_session(self):
+        from matador.commands import commands
+
+        if any(commands[name].project_session for name, _ in self._steps()):
+            return super(Batch, self)._create_session()
+        return None
+
+    def _execute(self):
+        from matador.commands import commands
+
+        steps = self._steps()
+        if self.session is not None:
+            self.session.update_repository()
+
+        self.timings = []
+        start = time.monotonic()
+        for number, (name, arguments) in enumerate(steps, 1):
+            self._logger.info('*' * 25)
+            self._logger.info('Step %d of %d: %s' % (number, len(steps), name))
+            self._logger.info('*' * 25)
+            step_start = time.monotonic()
+            if commands[name].project_session:
+                session = self.session.copy()
+            else:
+                session = None
+            try:
+                if arguments:
+                    commands[name](session=session, **arguments)
+                else:
+                    commands[name](session=session, argv=[])
+            except (Exception, SystemExit):
+                self._logger.error('Step %d failed after %.2fs' % (
+                    number, time.monotonic() - step_start))
+                raise
+            duration = time.monotonic() - step_start
+            self.timings.append((name, duration))
+            self._logger.info('Step %d completed in %.2fs' % (
+                number, duration))
+
+        self._logger.info('Ran %d step(s) in %.2fs' % (
+            len(steps), time.monotonic() - start))
@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+from .command import Command
+
+
+class Cache(Command):
+
+    """Reports on or prunes the project's cache of rendered scripts."""
+
+    def _add_arguments(self, parser):
+        parser.prog = 'matador cache'
+        parser.add_argument(
+            'action',
+            type=str,
+            choices=['stats', 'prune'],
+            help='Show the contents of the cache or evict old scripts')
+
+        parser.add_argument(
+            '--max-size',
+            type=float,
+            default=None,
+            help='The most megabytes to keep, which becomes the new limit')
+
+    def _execute(self):
+        cache = self.session.script_cache()
+
+        if self.args.action == 'prune':
+            if self.args.max_size is not None:
+                cache.max_size = int(self.args.max_size * 1024 * 1024)
+            evicted = cache.prune()
+            self._logger.info('Evicted %d script(s)' % evicted)
+
+        stats = cache.stats()
+        self._logger.info(
+            'Cache %s holds %d script(s), %.1f MB of %.1f MB' % (
+                cache.folder, stats['files'], stats['size'] / 1024 / 1024,
+                stats['max_size'] / 1024 / 1024))
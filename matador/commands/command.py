@@ -1,12 +1,26 @@
 #!/usr/bin/env python
 import logging
 import argparse
+import sys
+import threading
 from matador.session import Session
+from matador import executors
+
+# How many commands are running within one another in each thread, e.g. the
+# steps of a batch, so that connections are only closed by the outermost.
+_nesting = threading.local()
 
 
 class Command(object):
 
-    def __init__(self, **kwargs):
+    # Whether the command runs against the project repository in the current
+    # folder, so that it may share a session made for it, e.g. by the daemon
+    # or a batch. Otherwise, the command always creates its own session.
+    project_session = True
+
+    def __init__(self, session=None, argv=None, **kwargs):
+        parser = self.parser()
+
         if kwargs:
             # If kwargs have been supplied, use these in same way argsparse
             # would.
@@ -19,22 +33,91 @@ class Command(object):
                 pass
 
             self.args = Args()
+            # Start from the parser's defaults for any argument not supplied.
+            for action in parser._actions:
+                if action.default != argparse.SUPPRESS:
+                    setattr(self.args, action.dest, action.default)
             for key, value in kwargs.items():
                 setattr(self.args, key, value)
         else:
             # If the command is created from the command line, we'll have
-            # arguments to parse.
-            parser = argparse.ArgumentParser(
-                description="Taming the bull: Change management for Agresso systems")
-            self._add_arguments(parser)
-            self.args, unknown = parser.parse_known_args()
+            # arguments to parse, either our own or those passed on by the
+            # daemon. They follow the command's name, which is not ours to
+            # parse.
+            if argv is None:
+                argv = sys.argv[2:]
+            self.args, unknown = parser.parse_known_args(argv)
 
         self._logger = logging.getLogger(__name__)
-        Session.initialise()
-        self._execute()
+        # A session may be passed in to share its repositories and settings,
+        # e.g. when running several commands from a python script.
+        if session is None:
+            session = self._create_session()
+        if session is not None and getattr(self.args, 'share_objects', False):
+            session.share_project_objects()
+        self.session = session
+        depth = getattr(_nesting, 'depth', 0)
+        _nesting.depth = depth + 1
+        try:
+            self._execute()
+        finally:
+            _nesting.depth = depth
+            if depth == 0:
+                executors.close_all()
+
+    @classmethod
+    def parser(cls):
+        """The parser for the command's arguments
+
+        Returns
+        -------
+        argparse.ArgumentParser
+        """
+        parser = argparse.ArgumentParser(
+            description="Taming the bull: Change management for Agresso systems")
+        # Adding the arguments needs no state, so there is no need to run the
+        # command to build its parser.
+        cls.__new__(cls)._add_arguments(parser)
+        if cls.project_session:
+            parser.add_argument(
+                '--share-objects',
+                action='store_true',
+                help='Borrow objects from the project repository through git '
+                     'alternates rather than copying them')
+        return parser
+
+    @classmethod
+    def arguments(cls):
+        """The names of all the command's arguments
+
+        Returns
+        -------
+        list
+            The name of each argument's attribute, e.g. 'environment'
+        """
+        return [
+            action.dest for action in cls.parser()._actions
+            if action.dest != 'help']
+
+    @classmethod
+    def required_arguments(cls):
+        """The names of the arguments the command cannot run without
+
+        Returns
+        -------
+        list
+            The name of each argument's attribute, e.g. 'environment'
+        """
+        return [
+            action.dest for action in cls.parser()._actions
+            if action.required]
 
     def _add_arguments(self, parser):
         pass
 
+    def _create_session(self):
+        return Session(
+            share_objects=getattr(self.args, 'share_objects', False))
+
     def _execute(self):
         raise NotImplementedError
@@ -1,5 +1,4 @@
 from .command import Command
-from matador.session import Session
 from matador import git
 from pathlib import Path
 
@@ -17,7 +16,7 @@ class CreateTicket(Command):
 
     def _execute(self):
         ticket_folder = Path(
-            Session.project_folder, 'deploy', 'tickets', self.args.ticket)
+            self.session.project_folder, 'deploy', 'tickets', self.args.ticket)
         Path.mkdir(ticket_folder, parents=True, exist_ok=True)
         deploy_file = Path(ticket_folder, 'deploy.py')
 
@@ -25,8 +24,9 @@ class CreateTicket(Command):
             f.write('from matador.commands.deployment import *\n\n')
             f.close()
 
-        git.stage_file(Session.project_repo, deploy_file)
-        git.commit(Session.project_repo, 'Create ticket %s' % self.args.ticket)
+        git.stage_file(self.session.project_repo, deploy_file)
+        git.commit(
+            self.session.project_repo, 'Create ticket %s' % self.args.ticket)
 
 
 class CreatePackage(Command):
@@ -42,7 +42,8 @@ class CreatePackage(Command):
 
     def _execute(self):
         package_folder = Path(
-            Session.project_folder, 'deploy', 'packages', self.args.package)
+            self.session.project_folder, 'deploy', 'packages',
+            self.args.package)
         Path.mkdir(package_folder, parents=True, exist_ok=True)
 
         package_file = Path(package_folder, 'tickets.yml')
@@ -52,16 +53,16 @@ class CreatePackage(Command):
             f.write('# - 30\n')
             f.write('# - 31\n')
             f.close()
-        git.stage_file(Session.project_repo, package_file)
+        git.stage_file(self.session.project_repo, package_file)
 
         remove_file = Path(package_folder, 'remove.py')
         with remove_file.open('w') as f:
             f.write('from matador.commands.deployment import *\n\n')
             f.close()
-        git.stage_file(Session.project_repo, remove_file)
+        git.stage_file(self.session.project_repo, remove_file)
 
         git.commit(
-            Session.project_repo, 'Create package %s' % self.args.package)
+            self.session.project_repo, 'Create package %s' % self.args.package)
 
 
 class AddTicketToPackage(Command):
@@ -83,13 +84,13 @@ class AddTicketToPackage(Command):
 
     def _execute(self):
         package_file = Path(
-            Session.project_folder, 'deploy', 'packages', self.args.package,
-            'tickets.yml')
+            self.session.project_folder, 'deploy', 'packages',
+            self.args.package, 'tickets.yml')
 
         with package_file.open('a') as f:
             f.write('- %s\n' % self.args.ticket)
             f.close()
 
-        git.stage_file(Session.project_repo, package_file)
-        git.commit(Session.project_repo, 'Add ticket %s to package %s' % (
+        git.stage_file(self.session.project_repo, package_file)
+        git.commit(self.session.project_repo, 'Add ticket %s to package %s' % (
                 self.args.ticket, self.args.package))
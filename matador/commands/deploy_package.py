@@ -1,12 +1,116 @@
 #!/usr/bin/env python
 from .command import Command
-from .deploy_ticket import execute_ticket
-from matador.session import Session
-from matador import git
+from .run_sql_script import (
+    add_execution_arguments, set_execution_options)
+from .deploy_ticket import execute_ticket, run_action
+from matador.commands.deployment.deploy_sql_script import prefetch_scripts
+from matador import git, scheduler
+from matador.journal import Journal
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import shutil
+import threading
 import yaml
-from importlib.machinery import SourceFileLoader
+
+
+def _checkout_tickets(tickets, repo, tickets_folder, commit):
+    for ticket in tickets:
+        shutil.rmtree(str(Path(tickets_folder, ticket)), ignore_errors=True)
+    git.export_subtrees(
+        repo, commit, 'deploy/tickets', tickets, tickets_folder)
+
+
+def read_tickets(entries):
+    """Read the tickets in a package and the dependencies between them
+
+    Each entry in tickets.yml is either a ticket name or a mapping from a
+    ticket name to the tickets it depends on, given either as a list or as
+    the 'depends' key of a further mapping:
+
+        - A001
+        - A002: [A001]
+        - A003:
+            depends: [A001]
+
+    If no entry declares its dependencies, each ticket depends on the one
+    before it, so that the tickets are deployed one at a time, in order.
+
+    Parameters
+    ----------
+    entries : list
+        The contents of tickets.yml
+
+    Returns
+    -------
+    tuple
+        The list of ticket names and a dict of the tickets each depends on
+    """
+    tickets = []
+    dependencies = {}
+    for entry in entries or []:
+        if isinstance(entry, dict):
+            for ticket, depends in entry.items():
+                if isinstance(depends, dict):
+                    depends = depends.get('depends')
+                if depends is None:
+                    depends = []
+                elif not isinstance(depends, list):
+                    depends = [depends]
+                tickets.append(str(ticket))
+                dependencies[str(ticket)] = [str(item) for item in depends]
+        else:
+            tickets.append(str(entry))
+
+    if not dependencies:
+        dependencies = {
+            ticket: [previous]
+            for previous, ticket in zip(tickets, tickets[1:])}
+
+    return tickets, dependencies
+
+
+class Prefetcher(object):
+
+    """Prepares tickets on a background thread ahead of their deployment.
+
+    When a ticket is about to be deployed, the next tickets in the package
+    are queued to be prepared while it runs. Tickets are prepared one at a
+    time, in order.
+
+    Parameters
+    ----------
+    tickets : list
+        The tickets in the order in which they will be deployed
+    prepare : callable
+        Called with each ticket to prepare it
+    depth : int
+        How many tickets to prepare ahead of the one being deployed
+    """
+
+    def __init__(self, tickets, prepare, depth):
+        self.tickets = tickets
+        self.prepare = prepare
+        self.depth = depth
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=1)
+
+    def wait(self, ticket):
+        """Wait until a ticket has been prepared, queuing those after it"""
+        index = self.tickets.index(ticket)
+        with self._lock:
+            for upcoming in self.tickets[index:index + self.depth + 1]:
+                if upcoming not in self._futures:
+                    self._futures[upcoming] = self._pool.submit(
+                        self.prepare, upcoming)
+            future = self._futures[ticket]
+        future.result()
+
+    def close(self):
+        with self._lock:
+            for future in self._futures.values():
+                future.cancel()
+        self._pool.shutdown()
 
 
 class ActionPackage(Command):
@@ -17,7 +121,7 @@ class ActionPackage(Command):
             '-e', '--environment',
             type=str,
             required=True,
-            help='Agresso environment name')
+            help='Agresso environment name, or several separated by commas')
 
         parser.add_argument(
             '-p', '--package',
@@ -31,59 +135,220 @@ class ActionPackage(Command):
             default='none',
             help='Commit or tag ID')
 
+        parser.add_argument(
+            '-i', '--incremental',
+            action='store_true',
+            help='Skip scripts already run successfully as they stand')
+
+        add_execution_arguments(parser)
+
     @staticmethod
-    def _checkout_package(package, commit):
-        repo_folder = Session.matador_repository_folder
+    def _checkout_package(session, package, commit_id):
         package_folder = Path(
-            Session.matador_packages_folder, package)
+            session.matador_packages_folder, package)
 
         shutil.rmtree(str(package_folder), ignore_errors=True)
 
-        Session.update_repository()
-
-        git.checkout(Session.matador_repo, commit)
+        git.export_tree(
+            session.matador_repo, commit_id, 'deploy/packages/' + package,
+            package_folder)
 
-        src = Path(repo_folder, 'deploy', 'packages', package)
-        shutil.copytree(str(src), str(package_folder))
+        return package_folder
 
     def _execute(self):
-        Session.set_environment(self.args.environment)
+        environments = self.args.environment.split(',')
+        set_execution_options(self.session, self.args)
+        self.session.incremental = self.args.incremental
         if self.args.commit == 'none':
             commit = None
         else:
             commit = self.args.commit
-        self._checkout_package(self.args.package, commit)
+
+        self.session.update_repository()
+
+        # Resolve the commit once so that everything deployed as part of the
+        # package, to every environment, comes from the same snapshot, even
+        # if the branch moves.
+        self.commit_id = git.resolve_commit(
+            self.session.matador_repo, commit).decode(encoding='ascii')
+        self.session.commit_id = self.commit_id
+
+        self._execute_environments(environments)
+
+    def _execute_environments(self, environments):
+        if len(environments) == 1:
+            self.session.set_environment(environments[0])
+            self._execute_package(self.session)
+            return
+
+        sessions = {
+            environment: self.session.for_environment(environment)
+            for environment in environments}
+        scheduler.run_graph(
+            environments, {},
+            lambda environment: self._execute_package(sessions[environment]),
+            len(environments))
+
+    def _execute_package(self, session):
+        raise NotImplementedError
+
+
+def add_deployment_arguments(parser):
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=1,
+        help='The most tickets to deploy at once')
+
+    parser.add_argument(
+        '--prefetch',
+        type=int,
+        default=1,
+        help='How many tickets to prepare ahead of the one deploying')
+
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Carry on from where the last, incomplete, run stopped')
 
 
 class DeployPackage(ActionPackage):
 
-    def _execute(self):
-        super(DeployPackage, self)._execute()
-        if self.args.commit == 'none':
-            commit = None
+    def _add_arguments(self, parser):
+        super(DeployPackage, self)._add_arguments(parser)
+        add_deployment_arguments(parser)
+
+    def _checkout_tickets(self, session, tickets):
+        _checkout_tickets(
+            tickets, session.matador_repo, session.matador_tickets_folder,
+            session.commit_id)
+
+    def _prepare_ticket(self, session, ticket):
+        self._checkout_tickets(session, [ticket])
+        ticket_folder = Path(session.matador_tickets_folder, ticket)
+        deploy_file = Path(ticket_folder, 'deploy.py')
+        if deploy_file.exists():
+            prefetch_scripts(
+                session.matador_repo, deploy_file, ticket_folder,
+                session.script_cache())
+
+    def _deploy_ticket(self, session, prefetcher, ticket):
+        if prefetcher is not None:
+            prefetcher.wait(ticket)
+        self._logger.info('*' * 25)
+        self._logger.info('Deploying ticket %s to %s' % (
+            ticket, session.environment_name))
+        self._logger.info('*' * 25)
+        session.journal.ticket_started(ticket)
+        try:
+            execute_ticket(session, ticket, 'deploy', session.commit_id, True)
+        except BaseException:
+            session.journal.ticket_finished(ticket, False)
+            raise
+        session.journal.ticket_finished(ticket, True)
+
+    def _open_journal(self, session):
+        """Start or resume the journal of the package's deployment
+
+        Returns
+        -------
+        Session
+            A copy of the session using the journal and, when resuming, the
+            commit of the run being resumed, or None if there is nothing to
+            resume
+
+        Raises
+        ------
+        ValueError
+            If resuming a run from another commit than the one requested,
+            whether by the artifact being deployed or the commit argument
+        """
+        journal_folder = Path(session.matador_environment_folder, 'journal')
+        Path.mkdir(journal_folder, parents=True, exist_ok=True)
+        journal = Journal(Path(journal_folder, self.args.package + '.jsonl'))
+
+        if not self.args.resume:
+            journal.start(self.args.package, session.commit_id)
+            return session.copy(journal=journal)
+
+        if not journal.resumable:
+            self._logger.info(
+                'No incomplete deployment of %s to %s to resume' % (
+                    self.args.package, session.environment_name))
+            return None
+        # Tickets already deployed came from the journal's commit, so the
+        # rest must too, rather than from another artifact or commit.
+        if session.artifact is not None:
+            requested = session.artifact.commit_id
+        elif self.args.commit != 'none':
+            requested = session.commit_id
         else:
-            commit = self.args.commit
-        package_folder = Path(
-            Session.matador_packages_folder, self.args.package)
-        Session.deployment_folder = package_folder
+            requested = None
+        if requested is not None and requested != journal.commit_id:
+            raise ValueError(
+                'Cannot resume the deployment of %s to %s at commit %s, '
+                'since it was started at commit %s' % (
+                    self.args.package, session.environment_name, requested,
+                    journal.commit_id))
+        self._logger.info(
+            'Resuming deployment of %s to %s at commit %s' % (
+                self.args.package, session.environment_name,
+                journal.commit_id))
+        journal.resume()
+        return session.copy(journal=journal, commit_id=journal.commit_id)
+
+    def _execute_package(self, session):
+        session = self._open_journal(session)
+        if session is None:
+            return
+
+        package_folder = self._checkout_package(
+            session, self.args.package, session.commit_id)
         ticketsFile = Path(package_folder, 'tickets.yml')
 
         file = ticketsFile.open('r')
-        tickets = yaml.load(file)
-        for ticket in tickets:
-            self._logger.info('*' * 25)
-            self._logger.info('Deploying ticket %s' % ticket)
-            self._logger.info('*' * 25)
-            execute_ticket(str(ticket), 'deploy', commit, True)
+        tickets, dependencies = read_tickets(yaml.load(file))
+
+        # Tickets completed by the run being resumed are not deployed again.
+        done = session.journal.tickets_done
+        tickets = [ticket for ticket in tickets if ticket not in done]
+        dependencies = {
+            ticket: [item for item in depends if item not in done]
+            for ticket, depends in dependencies.items()}
+
+        # Either every ticket is checked out now or, while each ticket is
+        # deployed, the next are checked out and the scripts they refer to
+        # are written in the background.
+        if self.args.prefetch > 0:
+            prefetcher = Prefetcher(
+                tickets,
+                lambda ticket: self._prepare_ticket(session, ticket),
+                self.args.prefetch)
+        else:
+            prefetcher = None
+            self._checkout_tickets(session, tickets)
+
+        try:
+            scheduler.run_graph(
+                tickets, dependencies,
+                lambda ticket: self._deploy_ticket(
+                    session, prefetcher, ticket),
+                self.args.jobs)
+        finally:
+            if prefetcher is not None:
+                prefetcher.close()
+        session.journal.finish()
+
+        if session.matador_repo is not None:
+            self._logger.debug('Object cache: %s' % git.object_cache(
+                session.matador_repo).stats())
 
 
 class RemovePackage(ActionPackage):
 
-    def _execute(self):
-        super(RemovePackage, self)._execute()
-        package_folder = Path(
-            Session.matador_packages_folder, self.args.package)
-        Session.deployment_folder = package_folder
+    def _execute_package(self, session):
+        package_folder = self._checkout_package(
+            session, self.args.package, session.commit_id)
         sourceFile = Path(package_folder, 'remove.py')
 
-        SourceFileLoader('remove', str(sourceFile)).load_module()
+        run_action(session, 'remove', sourceFile)
@@ -1,34 +1,52 @@
 #!/usr/bin/env python
 from .command import Command
+from .run_sql_script import (
+    add_execution_arguments, set_execution_options)
 from matador.commands.deployment import *
-from matador.session import Session
 from matador import git
 from pathlib import Path
 import shutil
-from importlib.machinery import SourceFileLoader
+from importlib.util import spec_from_file_location, module_from_spec
 
 
 def _checkout_ticket(ticket, repo, ticket_folder, commit):
-    git.checkout(repo, commit)
-    src = Path(repo.path, 'deploy', 'tickets', ticket)
     shutil.rmtree(str(ticket_folder), ignore_errors=True)
-    shutil.copytree(str(src), str(ticket_folder))
+    git.export_tree(repo, commit, 'deploy/tickets/' + ticket, ticket_folder)
 
 
-def execute_ticket(ticket, action, commit, packaged=False):
-    ticket_folder = Path(Session.matador_tickets_folder, ticket)
-    Session.deployment_folder = ticket_folder
+def run_action(session, name, source_file):
+    """Run an action script as a module of its own
 
-    shutil.rmtree(ticket_folder, ignore_errors=True)
+    Each run gets a fresh module, which is not added to sys.modules, so that
+    scripts for different tickets may run at the same time without sharing
+    their namespaces. The script runs with a copy of the session, for the
+    folder containing it, as the current session.
+    """
+    spec = spec_from_file_location(
+        '%s_%s' % (name, source_file.parent.name), str(source_file))
+    module = module_from_spec(spec)
+    with session.copy(deployment_folder=source_file.parent).activate():
+        spec.loader.exec_module(module)
+    return module
 
-    if not packaged:
-        Session.update_repository()
 
-    _checkout_ticket(ticket, Session.matador_repo, ticket_folder, commit)
+def execute_ticket(session, ticket, action, commit, packaged=False):
+    """Run the action script for a ticket
+
+    If the ticket is part of a package, its folder will already have been
+    extracted from the package's snapshot and is used as it stands.
+    """
+    ticket_folder = Path(session.matador_tickets_folder, ticket)
+
+    if not packaged:
+        session.update_repository()
+        commit = git.resolve_commit(
+            session.matador_repo, commit).decode(encoding='ascii')
+        _checkout_ticket(ticket, session.matador_repo, ticket_folder, commit)
 
     actionFile = Path(action + '.py')
     sourceFile = Path(ticket_folder, actionFile)
-    SourceFileLoader(action, str(sourceFile)).load_module()
+    run_action(session.copy(commit_id=commit), action, sourceFile)
 
 
 class ActionTicket(Command):
@@ -60,13 +78,23 @@ class ActionTicket(Command):
             default=False,
             help='Whether this deployment is part of a package')
 
+        parser.add_argument(
+            '-i', '--incremental',
+            action='store_true',
+            help='Skip scripts already run successfully as they stand')
+
+        add_execution_arguments(parser)
+
     def _execute(self):
-        Session.set_environment(self.args.environment)
+        self.session.set_environment(self.args.environment)
+        set_execution_options(self.session, self.args)
+        self.session.incremental = self.args.incremental
         if self.args.commit == 'none':
             commit = None
         else:
             commit = self.args.commit
-        execute_ticket(self.args.ticket, self.action, commit, False)
+        execute_ticket(
+            self.session, self.args.ticket, self.action, commit, False)
 
 
 class DeployTicket(ActionTicket):
@@ -1 +1,2 @@
 from .deploy_sql_script import DeploySqlScript, DeployOraclePackage
+from .parallel import Parallel
@@ -1,28 +1,181 @@
 #!/usr/bin/env python
+import ast
+import logging
+import threading
 from pathlib import Path
-from matador.session import Session
 from .deployment import DeploymentCommand
-from matador.commands.run_sql_script import run_sql_script
 from matador import git
 
+logger = logging.getLogger(__name__)
+
+# The path in the repository and commit of each script already written by
+# prefetch_scripts, keyed by target file, which _fetch_script need not write
+# again.
+_prefetched = {}
+_prefetched_lock = threading.Lock()
+
+
+def render_script(repo, script_path, commit_ref, target_folder, cache=None):
+    """Write a script from the repository with its keywords substituted
+
+    Parameters
+    ----------
+    repo : dulwich.repo.Repo
+    script_path : pathlib.Path
+        The script's path within the repository
+    commit_ref : str
+    target_folder : pathlib.Path
+    cache : matador.script_cache.ScriptCache
+        If given, the script is taken from or added to the cache
+
+    Returns
+    -------
+    pathlib.Path
+        The script written, named as it is in the repository
+    """
+    target_script = Path(target_folder, script_path.name)
+
+    blob = git.lookup_blob(repo, commit_ref, script_path.as_posix())
+    blob_id = blob.id.decode(encoding='ascii')
+    commit_id = git.resolve_commit(repo, commit_ref).decode(encoding='ascii')
+    # The version keyword names the tag, when deploying from one, so the
+    # same commit may be rendered differently from different refs.
+    version = git.keyword_values(repo, commit_ref)['version']
+
+    if cache is not None and cache.fetch(
+            blob_id, commit_id, target_script, version):
+        return target_script
+
+    # The target may be a hard link into the cache, which must not be
+    # written through.
+    if target_script.exists():
+        target_script.unlink()
+
+    with target_script.open('wb') as f:
+        git.write_substituted(blob.chunked, f, repo, commit_ref)
+        f.close()
 
-def _fetch_script(repo, script_path, commit_ref, target_folder):
-    script = Path(repo.path, script_path)
-    target_script = Path(target_folder, script.name)
+    if cache is not None:
+        cache.store(blob_id, commit_id, target_script, version)
 
-    git.checkout(repo, commit_ref)
+    return target_script
 
-    with script.open('r') as f:
-        original_text = f.read()
-        f.close()
 
-    new_text = git.substitute_keywords(original_text, repo, commit_ref)
+def _fetch_script(repo, script_path, commit_ref, target_folder, cache=None):
+    target_script = Path(target_folder, script_path.name)
+    with _prefetched_lock:
+        prefetched = _prefetched.pop(str(target_script), None)
+    if (prefetched == (script_path.as_posix(), commit_ref) and
+            target_script.exists()):
+        return target_script
+
+    return render_script(
+        repo, script_path, commit_ref, target_folder, cache)
+
+
+def _deployment_script(session, script_path, commit_ref):
+    """Write a script for the deployment in progress to its folder
+
+    The script is taken from the artifact being deployed, if any, or else
+    from the repository.
+    """
+    if session.artifact is not None:
+        return session.artifact.extract_script(
+            script_path, commit_ref, session.deployment_folder)
+    return _fetch_script(
+        session.matador_repo, script_path, commit_ref,
+        session.deployment_folder, session.script_cache())
+
+
+def _commit_id(session, script_path, commit_ref):
+    if session.artifact is not None:
+        return session.artifact.script_commit(script_path, commit_ref)
+    return git.resolve_commit(
+        session.matador_repo, commit_ref).decode(encoding='ascii')
+
 
-    with target_script.open('w') as f:
-        f.write(new_text)
+def _package_paths(package_name):
+    package_folder = Path('src', 'db_objects', 'packages', package_name)
+    return [
+        Path(package_folder, package_name + '.pks'),
+        Path(package_folder, package_name + '.pkb')]
+
+
+def referenced_scripts(deploy_file, unresolved=None):
+    """Find the scripts a deployment file will fetch from the repository
+
+    Only calls to DeploySqlScript and DeployOraclePackage whose arguments are
+    literal strings are found.
+
+    Parameters
+    ----------
+    deploy_file : pathlib.Path
+    unresolved : list
+        If given, a description of each call whose scripts could not be
+        found, because its arguments are not literal strings, is appended
+
+    Returns
+    -------
+    list
+        The path within the repository and commit of each script
+    """
+    with deploy_file.open('r') as f:
+        tree = ast.parse(f.read(), str(deploy_file))
         f.close()
 
-    return target_script
+    scripts = []
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        name = getattr(node.func, 'id', getattr(node.func, 'attr', None))
+        if name not in ('DeploySqlScript', 'DeployOraclePackage'):
+            continue
+        try:
+            args = [ast.literal_eval(arg) for arg in node.args[:2]]
+        except ValueError:
+            args = None
+        if (args is None or not args or
+                not all(isinstance(arg, str) for arg in args)):
+            if unresolved is not None:
+                unresolved.append('%s at line %d' % (name, node.lineno))
+            continue
+        if name == 'DeploySqlScript':
+            if len(args) == 2 and str(Path(args[0]).parent) != '.':
+                scripts.append((Path(args[0]), args[1]))
+        elif len(args) == 2:
+            scripts.extend(
+                (package_path, args[1])
+                for package_path in _package_paths(args[0]))
+        elif unresolved is not None:
+            unresolved.append('%s at line %d' % (name, node.lineno))
+    return scripts
+
+
+def prefetch_scripts(repo, deploy_file, target_folder, cache=None):
+    """Write the scripts a deployment file will fetch ahead of time
+
+    Scripts which cannot be written are skipped, leaving any error to be
+    reported when the deployment itself fetches them.
+
+    Parameters
+    ----------
+    repo : dulwich.repo.Repo
+    deploy_file : pathlib.Path
+    target_folder : pathlib.Path
+    cache : matador.script_cache.ScriptCache
+        If given, scripts are taken from and added to the cache
+    """
+    for script_path, commit_ref in referenced_scripts(deploy_file):
+        try:
+            target_script = render_script(
+                repo, script_path, commit_ref, target_folder, cache)
+        except Exception as e:
+            logger.debug('Cannot prefetch %s at %s: %s' % (
+                script_path, commit_ref, e))
+            continue
+        with _prefetched_lock:
+            _prefetched[str(target_script)] = (
+                script_path.as_posix(), commit_ref)
 
 
 class DeploySqlScript(DeploymentCommand):
@@ -31,13 +184,14 @@ class DeploySqlScript(DeploymentCommand):
         path = Path(self.args[0])
 
         if str(path.parent) == '.':
-            script = Path(Session.deployment_folder, path)
+            script = Path(self.session.deployment_folder, path)
+            self._run_script(script)
         else:
             commit = self.args[1]
-            script = _fetch_script(
-                Session.matador_repo, path, commit, Session.deployment_folder)
-
-        run_sql_script(self._logger, str(script))
+            script = _deployment_script(self.session, path, commit)
+            self._run_script(
+                script, path.as_posix(),
+                _commit_id(self.session, path, commit))
 
 
 class DeployOraclePackage(DeploymentCommand):
@@ -46,18 +200,14 @@ class DeployOraclePackage(DeploymentCommand):
         package_name = self.args[0]
         commit = self.args[1]
 
-        repo_folder = Session.matador_repository_folder
-        package_folder = Path(
-            repo_folder, 'src', 'db_objects', 'packages', package_name)
-        package_spec = Path(package_folder, package_name + '.pks')
-        package_body = Path(package_folder, package_name + '.pkb')
-
-        spec_script = _fetch_script(
-            Session.matador_repo, package_spec, commit,
-            Session.deployment_folder)
-        body_script = _fetch_script(
-            Session.matador_repo, package_body, commit,
-            Session.deployment_folder)
-
-        run_sql_script(self._logger, spec_script)
-        run_sql_script(self._logger, body_script)
+        package_spec, package_body = _package_paths(package_name)
+
+        spec_script = _deployment_script(self.session, package_spec, commit)
+        body_script = _deployment_script(self.session, package_body, commit)
+
+        self._run_script(
+            spec_script, package_spec.as_posix(),
+            _commit_id(self.session, package_spec, commit))
+        self._run_script(
+            body_script, package_body.as_posix(),
+            _commit_id(self.session, package_body, commit))
@@ -1,12 +1,79 @@
 import logging
+from pathlib import Path
+from matador import git
+from matador.session import Session
+from matador.commands.run_sql_script import run_sql_script
+from matador.executors import ScriptError
 
 
 class DeploymentCommand(object):
 
-    def __init__(self, *args):
+    def __init__(self, *args, session=None):
         self._logger = logging.getLogger(__name__)
         self.args = args
-        self._execute()
+        self.results = []
+        if session is None:
+            session = Session.current()
+        self.session = session
+        if session.group is None:
+            self._execute()
+        else:
+            session.group.add(self)
+
+    def _run_script(self, script, name=None, commit_id=None):
+        """Run a script and record it in the environment's ledger
+
+        If the deployment is incremental and the ledger shows the script was
+        last run with the same contents and succeeded, it is skipped, as is a
+        script already run by a package deployment being resumed.
+
+        Parameters
+        ----------
+        script : pathlib.Path
+        name : str
+            Identifies the script in the ledger. By default, its path within
+            the environment's folder.
+        commit_id : str
+            The commit the script came from, if not that of the deployment
+
+        Returns
+        -------
+        matador.executors.ScriptResult
+            Or None if the script was skipped
+        """
+        session = self.session
+        script = Path(script)
+        if name is None:
+            try:
+                name = script.relative_to(
+                    session.matador_environment_folder).as_posix()
+            except ValueError:
+                name = script.as_posix()
+        if commit_id is None:
+            commit_id = session.commit_id
+
+        ticket = session.deployment_folder.name
+        journal = session.journal
+        if journal is not None and journal.script_done(ticket, name):
+            self._logger.info(
+                'Matador: Skipping %s, already run before resuming' % name)
+            return None
+
+        ledger = session.ledger()
+        sha = git.blob_id(script)
+        if session.incremental and ledger.applied(name, sha):
+            self._logger.info(
+                'Matador: Skipping %s, already applied as it stands' % name)
+            return None
+
+        result = run_sql_script(session, self._logger, str(script))
+        ledger.record(name, sha, ticket, commit_id, result)
+        if journal is not None:
+            journal.script_finished(ticket, name, result.succeeded)
+        self.results.append(result)
+        if session.fail_fast and not result.succeeded:
+            raise ScriptError(script, result)
+        return result
 
     def _execute(self):
         raise NotImplementedError
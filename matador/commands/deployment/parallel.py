@@ -0,0 +1,94 @@
+import logging
+import time
+from matador.session import Session
+from matador import scheduler
+
+logger = logging.getLogger(__name__)
+
+
+class Parallel(object):
+
+    """Run a group of deployment commands concurrently.
+
+    Deployment commands created within the group are collected rather than
+    run straight away. When the group ends, they are run on a pool of
+    threads, each with its own database session, and the group waits for
+    all of them to finish before the deployment carries on:
+
+        with Parallel(jobs=4):
+            DeployOraclePackage('package_a', 'v1.2')
+            DeployOraclePackage('package_b', 'v1.2')
+
+    The time taken by each command is logged. If any of them fails, the
+    others are still run and the first failure is then raised.
+
+    Parameters
+    ----------
+    jobs : int
+        The most commands to run at once
+
+    Attributes
+    ----------
+    commands : list
+        The deployment commands in the group
+    timings : list
+        The command, seconds taken and exception, if any, for each command
+        that was run
+    """
+
+    def __init__(self, jobs=4):
+        self.jobs = jobs
+        self.commands = []
+        self.timings = []
+
+    def add(self, command):
+        self.commands.append(command)
+
+    def __enter__(self):
+        self.session = Session.current()
+        if self.session.group is not None:
+            raise RuntimeError('Parallel groups cannot be nested')
+        self.session.group = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.session.group = None
+        if exc_type is None:
+            self.run()
+
+    def _run_command(self, command):
+        start = time.monotonic()
+        exception = None
+        try:
+            command._execute()
+        except Exception as e:
+            exception = e
+        duration = time.monotonic() - start
+        self.timings.append((command, duration, exception))
+        if exception is None:
+            logger.info('%s completed in %.2fs' % (
+                _describe(command), duration))
+        else:
+            logger.error('%s failed after %.2fs: %s' % (
+                _describe(command), duration, exception))
+
+    def run(self):
+        """Run the commands in the group and wait for them to finish"""
+        start = time.monotonic()
+        scheduler.run_graph(
+            list(range(len(self.commands))), {},
+            lambda index: self._run_command(self.commands[index]),
+            self.jobs)
+
+        failures = [
+            exception for command, duration, exception in self.timings
+            if exception is not None]
+        logger.info('Ran %d deployment(s) in %.2fs with %d failure(s)' % (
+            len(self.commands), time.monotonic() - start, len(failures)))
+        if failures:
+            raise failures[0]
+
+
+def _describe(command):
+    return '%s(%s)' % (
+        type(command).__name__, ', '.join(str(arg) for arg in command.args))
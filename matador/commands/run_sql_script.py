@@ -1,52 +1,56 @@
 #!/usr/bin/env python
 from pathlib import Path
 import os
-import subprocess
 from string import Template
 from .command import Command
-from matador.session import Session
+from matador import executors
 
 
-def _connection_string(dbms, connection, user, password):
-    if dbms.lower() == 'oracle':
-        return user + '/' + password + '@' + connection
-
-
-def _sql_script(file_path):
-    with file_path.open('r') as f:
-        script = f.read()
-        f.close()
-    return script
-
-
-def run_sql_script(logger, file_path):
+def run_sql_script(session, logger, file_path):
     file = Path(file_path)
     message = Template(
         'Matador: Executing ${file} against ${connection} \n')
     substitutions = {
         'file': file.name,
-        'connection': Session.environment['connection']
+        'connection': session.environment['connection']
     }
     logger.info(message.substitute(substitutions))
 
-    script = _sql_script(file)
-    connection_string = _connection_string(
-        Session.environment['dbms'],
-        Session.environment['connection'],
-        Session.credentials['user'],
-        Session.credentials['password'])
+    executor = executors.executor(
+        session.environment, session.credentials, session.reuse_sessions,
+        session.fail_fast, session.script_timeout, session.max_sessions)
+    return executor.run(file)
+
 
-    os.chdir(str(file.parent))
+def add_execution_arguments(parser):
+    parser.add_argument(
+        '-r', '--reuse-sessions',
+        action='store_true',
+        help='Run all scripts through one sqlplus session per connection')
 
-    if Session.environment['dbms'].lower() == 'oracle':
-        script += '\nshow error'
-        process = subprocess.Popen(
-            ['sqlplus', '-S', '-L', connection_string],
-            stdin=subprocess.PIPE,
-            stderr=subprocess.PIPE)
-        process.stdin.write(script.encode('utf-8'))
-        process.stdin.close()
-        process.wait()
+    parser.add_argument(
+        '--fail-fast',
+        action='store_true',
+        help='Stop at the first script to report an error')
+
+    parser.add_argument(
+        '--timeout',
+        type=float,
+        default=None,
+        help='Seconds to allow each script before stopping it')
+
+    parser.add_argument(
+        '--max-sessions',
+        type=int,
+        default=None,
+        help='The most scripts to run against the environment at once')
+
+
+def set_execution_options(session, args):
+    session.reuse_sessions = args.reuse_sessions
+    session.fail_fast = args.fail_fast
+    session.script_timeout = args.timeout
+    session.max_sessions = args.max_sessions
 
 
 class RunSqlScript(Command):
@@ -71,11 +75,17 @@ class RunSqlScript(Command):
             required=True,
             help='Agresso environment')
 
+        add_execution_arguments(parser)
+
     def _execute(self):
-        Session.set_environment(self.args.environment)
+        self.session.set_environment(self.args.environment)
+        set_execution_options(self.session, self.args)
 
         file_path = os.path.join(self.args.directory, self.args.file)
 
-        run_sql_script(
+        result = run_sql_script(
+            self.session,
             self._logger,
             file_path)
+        if self.session.fail_fast and not result.succeeded:
+            raise executors.ScriptError(file_path, result)
@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+import contextlib
+import io
+import json
+import logging
+import os
+import socket
+import socketserver
+import sys
+import threading
+import traceback
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SOCKET_PATH = Path(Path.home(), '.matador', 'daemon.sock')
+
+# Commands are run one at a time, since they share the process's working
+# directory, environment variables, logging configuration and standard
+# streams.
+_command_lock = threading.Lock()
+
+
+def supported():
+    """Whether the platform has the Unix sockets the daemon listens on"""
+    return hasattr(socket, 'AF_UNIX')
+
+
+class _StreamHandler(logging.Handler):
+
+    """Sends each log record to the client as a line of JSON."""
+
+    def __init__(self, send):
+        super(_StreamHandler, self).__init__()
+        self.send = send
+        self.setFormatter(logging.Formatter('%(message)s'))
+
+    def emit(self, record):
+        try:
+            self.send({'log': self.format(record), 'level': record.levelno})
+        except (OSError, ValueError):
+            # The client has gone away.
+            pass
+
+
+class _StreamWriter(io.TextIOBase):
+
+    """Sends anything written to stdout or stderr to the client."""
+
+    def __init__(self, send):
+        self.send = send
+
+    def write(self, text):
+        if text:
+            try:
+                self.send({'output': text})
+            except (OSError, ValueError):
+                pass
+        return len(text)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def _send(self, message):
+        self.wfile.write(json.dumps(message).encode('UTF-8') + b'\n')
+        self.wfile.flush()
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        request = json.loads(line.decode('UTF-8'))
+        exit_code = self.server.run(request, self._send)
+        try:
+            self._send({'exit': exit_code})
+        except OSError:
+            pass
+
+
+class Daemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    """Runs matador commands sent to it over a Unix socket.
+
+    A session is kept for each folder from which commands are sent, so the
+    project repository, its configuration files and the matador repository,
+    along with the caches held for it, stay open between commands. A session
+    is replaced whenever environments.yml or credentials.yml changes.
+
+    Each request is a line of JSON giving the command line arguments, the
+    folder, the environment variables and the logging level. The command
+    runs with the client's environment in place of the daemon's, so that
+    sqlplus and anything else it starts see the same PATH, ORACLE_HOME etc.
+    as they would without the daemon. The log records and any other output of
+    the command are sent back as lines of JSON, followed by its exit code.
+
+    Parameters
+    ----------
+    socket_path : pathlib.Path
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path=SOCKET_PATH):
+        self.socket_path = Path(socket_path)
+        self.sessions = {}
+        Path.mkdir(self.socket_path.parent, parents=True, exist_ok=True)
+        if self.socket_path.exists():
+            self.socket_path.unlink()
+        # The socket is created with only its owner able to connect, rather
+        # than restricted once it is already listening.
+        umask = os.umask(0o177)
+        try:
+            super(Daemon, self).__init__(str(self.socket_path), _Handler)
+        finally:
+            os.umask(umask)
+
+    def server_close(self):
+        super(Daemon, self).server_close()
+        if self.socket_path.exists():
+            self.socket_path.unlink()
+
+    @staticmethod
+    def _config_state(config_folder):
+        state = []
+        for name in ('environments.yml', 'credentials.yml'):
+            try:
+                state.append(Path(config_folder, name).stat().st_mtime)
+            except FileNotFoundError:
+                state.append(None)
+        return state
+
+    def session(self, folder):
+        """The warm session for commands sent from a folder
+
+        Parameters
+        ----------
+        folder : str
+
+        Returns
+        -------
+        Session
+            A copy of the session kept for the folder, so that settings made
+            by one command do not affect the next, or None if the folder is
+            not within a project repository
+        """
+        try:
+            session, state = self.sessions[folder]
+        except KeyError:
+            session = None
+        else:
+            if state != self._config_state(session.config_folder):
+                session = None
+
+        if session is None:
+            from dulwich.errors import NotGitRepository
+            from matador.session import Session
+            try:
+                session = Session()
+            except NotGitRepository:
+                return None
+            state = self._config_state(session.config_folder)
+            session.update_repository()
+            if state[1] is not None:
+                session.load_credentials()
+            self.sessions[folder] = (session, state)
+        return session.copy()
+
+    def run(self, request, send):
+        """Run the command in a request, returning its exit code"""
+        from matador import management
+
+        handler = _StreamHandler(send)
+        matador_logger = logging.getLogger('matador')
+        writer = _StreamWriter(send)
+
+        with _command_lock:
+            environ = dict(os.environ)
+            level = matador_logger.level
+            handlers = matador_logger.handlers
+            matador_logger.handlers = [handler]
+            matador_logger.setLevel(
+                logging.getLevelName(request.get('verbosity', 'INFO').upper()))
+            cwd = os.getcwd()
+            try:
+                with contextlib.redirect_stdout(writer), \
+                        contextlib.redirect_stderr(writer):
+                    os.chdir(request['cwd'])
+                    if 'env' in request:
+                        os.environ.clear()
+                        os.environ.update(request['env'])
+                    management.run_command(
+                        request['argv'],
+                        lambda: self.session(request['cwd']))
+                return 0
+            except SystemExit as e:
+                if e.code is None or isinstance(e.code, int):
+                    return e.code or 0
+                return 1
+            except Exception:
+                matador_logger.error(traceback.format_exc())
+                return 1
+            finally:
+                os.chdir(cwd)
+                os.environ.clear()
+                os.environ.update(environ)
+                matador_logger.handlers = handlers
+                matador_logger.setLevel(level)
+
+
+def serve(socket_path=SOCKET_PATH):
+    """Run the daemon until it is interrupted"""
+    if not supported():
+        raise OSError('The matador daemon requires Unix domain sockets')
+    server = Daemon(socket_path)
+    logger.info('Matador daemon listening on %s' % socket_path)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def send_command(argv, verbosity='INFO', socket_path=SOCKET_PATH,
+                 output=None, log=None):
+    """Run a command through the daemon, if it is running
+
+    The command runs in the current folder and with the current environment
+    variables. Its log records are passed to the log and any other output is
+    written to the output stream.
+
+    Parameters
+    ----------
+    argv : list
+        The command line arguments, as they would follow 'matador'
+    verbosity : str
+    socket_path : pathlib.Path
+    output : file
+        Defaults to sys.stdout
+    log : logging.Logger
+        Defaults to the 'matador' logger
+
+    Returns
+    -------
+    int
+        The exit code of the command or None if the daemon is not running
+    """
+    if not supported() or not Path(socket_path).exists():
+        return None
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(str(socket_path))
+    except OSError:
+        client.close()
+        return None
+
+    if output is None:
+        output = sys.stdout
+    if log is None:
+        log = logging.getLogger('matador')
+    with client, client.makefile('rwb') as stream:
+        stream.write(json.dumps({
+            'argv': argv,
+            'cwd': os.getcwd(),
+            'env': dict(os.environ),
+            'verbosity': verbosity,
+        }).encode('UTF-8') + b'\n')
+        stream.flush()
+        for line in stream:
+            message = json.loads(line.decode('UTF-8'))
+            if 'log' in message:
+                log.log(message['level'], message['log'])
+            elif 'output' in message:
+                output.write(message['output'])
+                output.flush()
+            elif 'exit' in message:
+                return message['exit']
+    # The daemon went away before the command finished.
+    return 1
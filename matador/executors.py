@@ -0,0 +1,538 @@
+#!/usr/bin/env python
+import logging
+import os
+import re
+import subprocess
+import threading
+import time
+import queue
+from collections import namedtuple
+from importlib import import_module
+from matador import sqlplus
+
+logger = logging.getLogger(__name__)
+
+# The size of the blocks in which scripts are passed to sqlplus
+CHUNK_SIZE = 64 * 1024
+
+_pools = {}
+_limits = {}
+_lock = threading.Lock()
+
+_SQLPLUS_COMMAND = re.compile(
+    r'\s*(@|(SET(?!\s+(TRANSACTION|ROLE|CONSTRAINTS?)\b)|SHOW?|'
+    r'SPO(OL)?|WHENEVER|EXIT|QUIT|REM(ARK)?|DEF(INE)?|UNDEF(INE)?|'
+    r'COL(UMN)?|TTITLE|BTITLE|BREAK|COMPUTE|CLEAR|STA(RT)?|PRO(MPT)?|'
+    r'EXEC(UTE)?)(\s|;|$))',
+    re.IGNORECASE)
+
+_BLOCK_START = re.compile(
+    r'\s*(DECLARE|BEGIN|CREATE\s+(OR\s+REPLACE\s+)?'
+    r'((NON)?EDITIONABLE\s+)?'
+    r'(PROCEDURE|FUNCTION|PACKAGE|TRIGGER|TYPE|LIBRARY|JAVA))\b',
+    re.IGNORECASE)
+
+
+class ScriptResult(namedtuple('ScriptResult', 'exit_code errors duration')):
+
+    """The outcome of running a script.
+
+    Attributes
+    ----------
+    exit_code : int
+    errors : list
+        The messages for each error reported while the script ran
+    duration : float
+        Seconds taken to run the script
+    """
+
+    @property
+    def succeeded(self):
+        return self.exit_code == 0 and not self.errors
+
+
+class ScriptError(Exception):
+
+    """Raised when a script fails and the deployment should stop."""
+
+    def __init__(self, file, result):
+        super(ScriptError, self).__init__(
+            '%s failed with %d error(s): %s' % (
+                file, len(result.errors), '; '.join(result.errors)))
+        self.file = file
+        self.result = result
+
+
+def _connection_string(dbms, connection, user, password):
+    if dbms.lower() == 'oracle':
+        return user + '/' + password + '@' + connection
+
+
+def _script_chunks(file, trailer=b''):
+    """Read a script in fixed size chunks followed by an optional trailer"""
+    with file.open('rb') as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+        f.close()
+    if trailer:
+        yield trailer
+
+
+def _scan(line, state):
+    """Scan a line of SQL for the ends of statements
+
+    Returns the quoting or comment state at the end of the line and a list of
+    the parts into which the line's statement terminating semicolons divide
+    it. Each part is given as the position of the semicolon which ends it, or
+    None for the rest of the line, and whether it contains anything other
+    than comments.
+    """
+    parts = []
+    significant = False
+    i = 0
+    while i < len(line):
+        char = line[i]
+        pair = line[i:i + 2]
+        if state == '/*':
+            if pair == '*/':
+                state = None
+                i += 1
+        elif state in ("'", '"'):
+            if char == state:
+                state = None
+        elif pair == '--':
+            break
+        elif pair == '/*':
+            state = '/*'
+            i += 1
+        elif char == ';':
+            parts.append((i, True))
+            significant = False
+        elif not char.isspace():
+            significant = True
+            if char in ("'", '"'):
+                state = char
+        i += 1
+    parts.append((None, significant))
+    return state, parts
+
+
+def split_statements(lines):
+    """Split a SQL*Plus script into statements for a DB-API cursor
+
+    SQL statements end with a semicolon, which is removed, or with a line
+    holding a single '/'. PL/SQL blocks and stored program units end with a
+    line holding a single '/'. Comments between statements and SQL*Plus
+    commands are dropped, except for EXECUTE, which is converted to an
+    anonymous block.
+
+    Parameters
+    ----------
+    lines : iterable
+        The lines of the script, e.g. an open file
+
+    Returns
+    -------
+    generator
+        Each statement as a str
+    """
+    buffer = []
+    in_block = False
+    state = None
+    for line in lines:
+        stripped = line.strip()
+        if not buffer and state is None:
+            command = _SQLPLUS_COMMAND.match(line)
+            if command:
+                if command.group(2).upper().startswith('EXEC'):
+                    procedure = line[command.end():].strip().rstrip(';')
+                    yield 'BEGIN %s; END;' % procedure
+                else:
+                    logger.debug('Skipping SQL*Plus command: %s' % stripped)
+                continue
+            in_block = bool(_BLOCK_START.match(line))
+
+        if in_block:
+            if stripped == '/':
+                yield ''.join(buffer).strip()
+                buffer = []
+                in_block = False
+            elif buffer or stripped:
+                buffer.append(line)
+            continue
+
+        if stripped == '/' and state is None:
+            # A '/' on its own runs the statement in the buffer, if any, as
+            # SQL*Plus does for one not ended by a semicolon.
+            if buffer:
+                yield ''.join(buffer).strip()
+                buffer = []
+            continue
+
+        state, parts = _scan(line, state)
+        start = 0
+        for terminator, significant in parts:
+            if terminator is None:
+                if buffer or significant:
+                    buffer.append(line[start:])
+            else:
+                buffer.append(line[start:terminator])
+                statement = ''.join(buffer).strip()
+                if statement:
+                    yield statement
+                buffer = []
+                start = terminator + 1
+
+    if buffer:
+        logger.warning(
+            'Unterminated statement at end of script: %s' %
+            ''.join(buffer).strip())
+
+
+class ConnectionPool(object):
+
+    """A pool of DB-API connections to one database.
+
+    Parameters
+    ----------
+    connect : callable
+        Returns a new connection each time it is called
+    size : int
+        The maximum number of idle connections to keep
+    """
+
+    def __init__(self, connect, size=4):
+        self._connect = connect
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def release(self, connection):
+        try:
+            self._idle.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class Executor(object):
+
+    """Runs scripts against the database of an environment.
+
+    Parameters
+    ----------
+    environment : dict
+        The environment's entry from environments.yml
+    credentials : dict
+        The environment's entry from credentials.yml
+    fail_fast : bool
+        Whether to stop a script at its first error
+    timeout : float
+        Seconds to allow each script before it is stopped
+    max_sessions : int
+        The most scripts to run against the environment at once, across
+        every executor for it. If not given, the environment's
+        'max_sessions' key is used, if any.
+    """
+
+    def __init__(self, environment, credentials, fail_fast=False,
+                 timeout=None, max_sessions=None):
+        self.environment = environment
+        self.credentials = credentials
+        self.fail_fast = fail_fast
+        self.timeout = timeout
+        self.limit = session_limit(environment, max_sessions)
+
+    def run(self, file):
+        """Run a script
+
+        Parameters
+        ----------
+        file : pathlib.Path
+
+        Returns
+        -------
+        ScriptResult
+        """
+        if self.limit is not None:
+            self.limit.acquire()
+        try:
+            start = time.monotonic()
+            exit_code, errors = self._run(file)
+        finally:
+            if self.limit is not None:
+                self.limit.release()
+        result = ScriptResult(exit_code, errors, time.monotonic() - start)
+        if result.succeeded:
+            logger.debug('%s completed in %.2fs' % (file.name, result.duration))
+        else:
+            logger.error('%s failed with %d error(s) in %.2fs' % (
+                file.name, len(result.errors), result.duration))
+        return result
+
+    def _run(self, file):
+        raise NotImplementedError
+
+
+def _read_output(stream, errors, process, fail_fast):
+    while True:
+        line = stream.readline(sqlplus.MAX_LINE_LENGTH)
+        if not line:
+            break
+        if sqlplus.log_output(line, errors) and fail_fast:
+            process.kill()
+    stream.close()
+
+
+def _write_input(stream, chunks):
+    try:
+        for chunk in chunks:
+            stream.write(chunk)
+        stream.close()
+    except BrokenPipeError:
+        pass
+
+
+class SqlPlusExecutor(Executor):
+
+    """Runs scripts by piping them into sqlplus.
+
+    The script is copied from disk to sqlplus in fixed size chunks, so it is
+    never held in memory as a whole. Both of sqlplus's output streams are
+    read as the script runs and logged line by line, noting any ORA-, SP2- or
+    PLS- errors.
+
+    If sessions are reused, scripts are instead run by their absolute paths
+    through one sqlplus session per connection, so any script they call
+    relative to their own folder must be called with @@.
+    """
+
+    def __init__(self, environment, credentials, reuse_sessions=False,
+                 fail_fast=False, timeout=None, max_sessions=None):
+        super(SqlPlusExecutor, self).__init__(
+            environment, credentials, fail_fast, timeout, max_sessions)
+        self.reuse_sessions = reuse_sessions
+
+    def _run(self, file):
+        connection_string = _connection_string(
+            self.environment['dbms'],
+            self.environment['connection'],
+            self.credentials['user'],
+            self.credentials['password'])
+
+        # The sqlplus executable may be overridden by the environment, either
+        # as a path or as a command line, e.g. to use a stand-in for testing.
+        command = self.environment.get('sqlplus', 'sqlplus')
+        if isinstance(command, str):
+            command = [command]
+        command = command + ['-S', '-L', connection_string]
+
+        if self.reuse_sessions:
+            script = [
+                b'@"' + os.fsencode(str(file.resolve())) + b'"\n',
+                b'show error\n']
+            return sqlplus.run_script(
+                command, script, self.timeout, self.fail_fast)
+
+        script = _script_chunks(file, b'\nshow error\n')
+
+        process = subprocess.Popen(
+            command,
+            cwd=str(file.parent),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE)
+
+        errors = []
+        threads = [
+            threading.Thread(
+                target=_read_output,
+                args=(process.stdout, errors, process, self.fail_fast)),
+            threading.Thread(
+                target=_read_output,
+                args=(process.stderr, errors, process, self.fail_fast)),
+            threading.Thread(
+                target=_write_input, args=(process.stdin, script))
+        ]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        try:
+            exit_code = process.wait(self.timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            exit_code = process.wait()
+            message = 'Timed out after %s seconds' % self.timeout
+            logger.error(message)
+            errors.append(message)
+
+        for thread in threads:
+            thread.join()
+        return exit_code, errors
+
+
+class DbApiExecutor(Executor):
+
+    """Runs scripts statement by statement over a DB-API connection.
+
+    Connections are taken from a pool shared by every executor for the same
+    database. If a timeout is set, a statement still running when it expires
+    is interrupted, if the driver supports it, and the script is stopped.
+    """
+
+    def __init__(self, environment, credentials, driver, fail_fast=False,
+                 timeout=None, max_sessions=None):
+        super(DbApiExecutor, self).__init__(
+            environment, credentials, fail_fast, timeout, max_sessions)
+        self.driver = driver
+        key = (
+            driver, environment['connection'],
+            (credentials or {}).get('user'))
+        with _lock:
+            try:
+                self.pool = _pools[key]
+            except KeyError:
+                self.pool = _pools[key] = ConnectionPool(
+                    self._connect, environment.get('pool_size', 4))
+
+    def _connect(self):
+        module = import_module(self.driver)
+        if self.driver == 'sqlite3':
+            return module.connect(
+                self.environment['connection'], check_same_thread=False)
+        return module.connect(
+            user=self.credentials['user'],
+            password=self.credentials['password'],
+            dsn=self.environment['connection'])
+
+    def _run(self, file):
+        errors = []
+        connection = self.pool.acquire()
+        timer = None
+        if self.timeout is not None:
+            interrupt = (
+                getattr(connection, 'interrupt', None) or
+                getattr(connection, 'cancel', None))
+            if interrupt is not None:
+                timer = threading.Timer(self.timeout, interrupt)
+                timer.start()
+        start = time.monotonic()
+        try:
+            cursor = connection.cursor()
+            with file.open('r') as f:
+                for statement in split_statements(f):
+                    if (self.timeout is not None and
+                            time.monotonic() - start > self.timeout):
+                        errors.append(
+                            'Timed out after %s seconds' % self.timeout)
+                        break
+                    try:
+                        cursor.execute(statement)
+                    except Exception as e:
+                        message = '%s: %s' % (type(e).__name__, e)
+                        logger.error('%s\n%s' % (statement, message))
+                        errors.append(message)
+                        if self.fail_fast:
+                            break
+                f.close()
+            cursor.close()
+            if errors and self.fail_fast:
+                connection.rollback()
+            else:
+                connection.commit()
+        finally:
+            if timer is not None:
+                timer.cancel()
+            self.pool.release(connection)
+        return (1 if errors else 0), errors
+
+
+def session_limit(environment, max_sessions=None):
+    """The semaphore limiting concurrent scripts against an environment
+
+    Parameters
+    ----------
+    environment : dict
+    max_sessions : int
+        Overrides the environment's 'max_sessions' key
+
+    Returns
+    -------
+    threading.BoundedSemaphore
+        Shared by every caller for the same connection and limit, or None if
+        there is no limit
+    """
+    if max_sessions is None:
+        max_sessions = environment.get('max_sessions')
+    if not max_sessions:
+        return None
+    key = (environment['connection'], max_sessions)
+    with _lock:
+        try:
+            return _limits[key]
+        except KeyError:
+            limit = _limits[key] = threading.BoundedSemaphore(max_sessions)
+            return limit
+
+
+def executor(environment, credentials, reuse_sessions=False,
+             fail_fast=False, timeout=None, max_sessions=None):
+    """Create the executor for an environment
+
+    An environment with a 'driver' key uses the DB-API module of that name.
+    Otherwise, 'oracle' environments use sqlplus and 'sqlite' environments
+    use the sqlite3 module.
+
+    Parameters
+    ----------
+    environment : dict
+    credentials : dict
+    reuse_sessions : bool
+        Whether sqlplus sessions should be kept open between scripts
+    fail_fast : bool
+        Whether to stop a script at its first error
+    timeout : float
+        Seconds to allow each script before it is stopped
+    max_sessions : int
+        The most scripts to run against the environment at once
+
+    Returns
+    -------
+    Executor
+    """
+    driver = environment.get('driver')
+    dbms = environment['dbms'].lower()
+    if driver is None and dbms == 'oracle':
+        return SqlPlusExecutor(
+            environment, credentials, reuse_sessions, fail_fast, timeout,
+            max_sessions)
+    if driver is None and dbms == 'sqlite':
+        driver = 'sqlite3'
+    if driver is None:
+        raise ValueError('No executor for dbms %s' % environment['dbms'])
+    return DbApiExecutor(
+        environment, credentials, driver, fail_fast, timeout, max_sessions)
+
+
+def close_all():
+    """Close every pooled connection and idle sqlplus session"""
+    sqlplus.close_sessions()
+    with _lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
@@ -1,12 +1,34 @@
 import logging
 from dulwich.client import LocalGitClient
-from dulwich.index import build_index_from_tree
-from dulwich.objects import format_timezone
+from dulwich.index import build_index_from_tree, build_file_from_blob
+from dulwich.objects import format_timezone, Commit, Tag, S_ISGITLINK
+from dulwich.object_store import tree_lookup_path
+from dulwich.errors import NotTreeError
+from pathlib import Path
+from bisect import bisect_left
+from string import hexdigits
+from weakref import WeakKeyDictionary, ref as weak_ref
+from collections import OrderedDict
+from threading import RLock
+from stat import S_ISDIR
 from time import strftime, gmtime
+from hashlib import sha1
+import json
+import os
+import posixpath
 import re
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_CACHE_SIZE = 64 * 1024 * 1024
+
+_ref_indexes = WeakKeyDictionary()
+_object_caches = WeakKeyDictionary()
+_cache_lock = RLock()
+
+_keyword_pattern = re.compile(r'(version|date|author):[^\r\n]*')
+_keyword_bytes_pattern = re.compile(rb'(version|date|author):[^\r\n]*')
+
 
 def stage_file(repo, file):
     """Stage a file to the index
@@ -34,13 +56,75 @@ def commit(repo, message):
     """
     message = bytes(message, encoding='UTF-8')
     repo.do_commit(message)
+    clear_ref_index(repo)
+
+
+def share_objects(source_repo, target_repo):
+    """Make the objects of one repository available to another
+
+    The source repository's object store is added to the target's
+    :code:`objects/info/alternates`, so that fetching from the source only
+    needs to update refs. The stores are only linked if both repositories are
+    on the same file system.
+
+    The equivalent of :code:`git clone --shared`
+
+    Parameters
+    ----------
+    source_repo : dulwich.repo.Repo
+    target_repo : dulwich.repo.Repo
+
+    Returns
+    -------
+    bool
+        Whether the target repository now shares the source's objects
+    """
+    source_path = os.path.realpath(source_repo.object_store.path)
+    target_path = os.path.realpath(target_repo.object_store.path)
+    if os.stat(source_path).st_dev != os.stat(target_path).st_dev:
+        return False
+
+    alternates = [
+        os.path.realpath(store.path)
+        for store in target_repo.object_store.alternates]
+    if source_path not in alternates:
+        target_repo.object_store.add_alternate_path(source_path)
+    return True
+
+
+def _ref_fingerprint(repo):
+    """Capture the state of the files in which a repository keeps its refs"""
+    controldir = Path(repo.controldir())
+    files = [Path(controldir, 'HEAD'), Path(controldir, 'packed-refs')]
+    files.extend(Path(controldir, 'refs').glob('**/*'))
+    fingerprint = {}
+    for file in files:
+        try:
+            stat = file.stat()
+        except FileNotFoundError:
+            continue
+        if S_ISDIR(stat.st_mode):
+            continue
+        fingerprint[file.relative_to(controldir).as_posix()] = [
+            stat.st_mtime_ns, stat.st_size, stat.st_ino]
+    return fingerprint
+
+
+def _fetch_state_file(repo):
+    return Path(repo.controldir(), 'matador_fetch.json')
 
 
 def fetch_all(source_repo, target_repo, remote_name=None):
     """Fetch branches and tags from a remote repository
 
     Unlike :code:`git fetch`, this will also update local branches to point at the
-    same commit as their remote counterpart.
+    same commit as their remote counterpart. The branch checked out in the
+    source repository has no bearing on the target's HEAD.
+
+    A fingerprint of the files holding the source repository's refs is kept
+    in the target repository. If it is unchanged since the last fetch, the
+    fetch is skipped entirely. Otherwise, only those refs which have moved are
+    requested and updated.
 
      Parameters
     ----------
@@ -51,13 +135,314 @@ def fetch_all(source_repo, target_repo, remote_name=None):
     if remote_name is None:
         remote_name = 'origin'
 
-    refs = LocalGitClient().fetch(source_repo.path, target_repo)
-
-    for key, value in refs.items():
+    state_file = _fetch_state_file(target_repo)
+    fingerprint = _ref_fingerprint(source_repo)
+    try:
+        with state_file.open('r') as f:
+            previous_fingerprint = json.load(f)
+            f.close()
+    except (FileNotFoundError, ValueError):
+        previous_fingerprint = None
+
+    if fingerprint == previous_fingerprint:
+        logger.debug('Refs unchanged since last fetch')
+        return
+
+    target_refs = target_repo.get_refs()
+    changed_refs = {}
+    for key, value in source_repo.get_refs().items():
+        # Only branches and tags are copied. The source's HEAD, in
+        # particular, would otherwise be written through the target's HEAD
+        # to whichever branch that points at.
+        if not key.startswith((b'refs/heads/', b'refs/tags/')):
+            continue
         remote_key = key.replace(
             b'heads', b'remotes/%s' % bytes(remote_name, encoding='UTF-8'))
+        if (target_refs.get(key) != value or
+                target_refs.get(remote_key) != value):
+            changed_refs[key] = (remote_key, value)
+
+    wants = set(
+        value for remote_key, value in changed_refs.values()
+        if value not in target_repo.object_store)
+    if wants:
+        LocalGitClient().fetch(
+            source_repo.path, target_repo,
+            determine_wants=lambda refs: list(wants))
+
+    for key, (remote_key, value) in changed_refs.items():
         target_repo.refs[remote_key] = value
         target_repo[key] = value
+    clear_ref_index(target_repo)
+
+    with state_file.open('w') as f:
+        json.dump(fingerprint, f)
+        f.close()
+
+
+class RefIndex(object):
+
+    """An index for resolving names and ids to the commits of a repository.
+
+    The refs of the repository are read once, when the index is built, and
+    short names, fully qualified refs and abbreviated ids are all resolved
+    from memory thereafter.
+
+    Parameters
+    ----------
+    repo : dulwich.repo.Repo
+    """
+
+    def __init__(self, repo):
+        # The index is kept in a WeakKeyDictionary keyed by the repository,
+        # so it must not keep the repository alive itself.
+        self._repo_ref = weak_ref(repo)
+        self._refs = {}
+        self._full_refs = {}
+        self._commits = {}
+
+        for key, value in repo.get_refs().items():
+            self._refs[key.decode(encoding='UTF-8')] = value
+
+        # Tags are added after branches so that a tag takes precedence over
+        # a branch of the same name.
+        for ref_type in ['refs/heads/', 'refs/tags/']:
+            for ref in self._refs:
+                if ref.startswith(ref_type):
+                    self._full_refs[ref[len(ref_type):]] = ref
+
+    @property
+    def _repo(self):
+        repo = self._repo_ref()
+        if repo is None:
+            raise ReferenceError('The repository has been closed')
+        return repo
+
+    def full_ref(self, ref):
+        """The fully qualified ref for a branch or tag name
+
+        Returns the ref as provided if it is not the name of a branch or tag.
+        """
+        return self._full_refs.get(ref, ref)
+
+    def _expand_id(self, ref):
+        # Abbreviated ids are rare and each is resolved only once, so the
+        # object store is scanned for them rather than indexed up front.
+        prefix = bytes(ref, encoding='ascii')
+        matches = []
+        for sha in self._repo.object_store:
+            if sha.startswith(prefix):
+                matches.append(sha)
+                if len(matches) > 1:
+                    break
+        if len(matches) != 1:
+            raise KeyError(ref)
+        return matches[0]
+
+    def resolve(self, ref):
+        """The id of the commit to which a ref points
+
+        Parameters
+        ----------
+        ref : str
+            A branch or tag name, a fully qualified ref, HEAD or a full or
+            abbreviated commit id
+
+        Returns
+        -------
+        bytes
+
+        Raises
+        ------
+        KeyError
+            If nothing, or more than one object, matches the ref
+        ValueError
+            If the ref names an object other than a commit, e.g. a blob
+        """
+        try:
+            return self._commits[ref]
+        except KeyError:
+            pass
+
+        full_ref = self.full_ref(ref)
+        if full_ref in self._refs:
+            sha = self._refs[full_ref]
+        elif 4 <= len(ref) <= 40 and all(c in hexdigits for c in ref):
+            sha = bytes(ref.lower(), encoding='ascii')
+            if len(ref) < 40 or sha not in self._repo.object_store:
+                sha = self._expand_id(ref.lower())
+        else:
+            raise KeyError(ref)
+
+        objects = object_cache(self._repo)
+        obj = objects[sha]
+        while isinstance(obj, Tag):
+            obj = objects[obj.object[1]]
+        if not isinstance(obj, Commit):
+            raise ValueError('%s is a %s, not a commit' % (
+                ref, obj.type_name.decode(encoding='ascii')))
+
+        self._commits[ref] = obj.id
+        return obj.id
+
+
+def ref_index(repo):
+    """The ref index for a repository
+
+    The index is built on first use and kept until :func:`clear_ref_index` is
+    called for the repository.
+
+    Parameters
+    ----------
+    repo : dulwich.repo.Repo
+
+    Returns
+    -------
+    RefIndex
+    """
+    with _cache_lock:
+        try:
+            return _ref_indexes[repo]
+        except KeyError:
+            index = _ref_indexes[repo] = RefIndex(repo)
+            return index
+
+
+def clear_ref_index(repo=None):
+    """Discard the ref index for a repository, or for all repositories
+
+    Parameters
+    ----------
+    repo : dulwich.repo.Repo
+    """
+    with _cache_lock:
+        if repo is None:
+            _ref_indexes.clear()
+        else:
+            _ref_indexes.pop(repo, None)
+
+
+class ObjectCache(object):
+
+    """A bounded cache of the commits and trees of a repository.
+
+    Decoded commits and trees are kept in least recently used order until
+    their total size exceeds a limit. Blobs are passed through uncached. The
+    metadata derived from commits for keyword substitution is also kept.
+
+    Lookups are serialised, so the cache may be shared between threads.
+
+    Parameters
+    ----------
+    object_store : dulwich.object_store.BaseObjectStore
+    max_size : int
+        The maximum total size, in bytes, of the raw objects held
+    """
+
+    def __init__(self, object_store, max_size=None):
+        if max_size is None:
+            max_size = DEFAULT_CACHE_SIZE
+        self.object_store = object_store
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.metadata_hits = 0
+        self.metadata_misses = 0
+        self._objects = OrderedDict()
+        self._metadata = {}
+        self._lock = RLock()
+
+    def __getitem__(self, sha):
+        with self._lock:
+            try:
+                obj, size = self._objects.pop(sha)
+            except KeyError:
+                pass
+            else:
+                self._objects[sha] = (obj, size)
+                self.hits += 1
+                return obj
+
+            obj = self.object_store[sha]
+            if obj.type_name in (b'commit', b'tree'):
+                self.misses += 1
+                size = obj.raw_length()
+                self._objects[sha] = (obj, size)
+                self.size += size
+                while self.size > self.max_size and len(self._objects) > 1:
+                    evicted_sha, (evicted, evicted_size) = (
+                        self._objects.popitem(last=False))
+                    self.size -= evicted_size
+            return obj
+
+    def commit_metadata(self, sha):
+        """The short id, formatted timestamp and author of a commit
+
+        Parameters
+        ----------
+        sha : bytes
+
+        Returns
+        -------
+        tuple
+        """
+        with self._lock:
+            try:
+                metadata = self._metadata[sha]
+            except KeyError:
+                pass
+            else:
+                self.metadata_hits += 1
+                return metadata
+
+            commit = self[sha]
+            commit_time = strftime(
+                '%Y-%m-%d %H:%M:%S', gmtime(commit.commit_time))
+            timezone = format_timezone(
+                commit.commit_timezone).decode(encoding='ascii')
+            metadata = self._metadata[sha] = (
+                sha[:7].decode(encoding='ascii'),
+                commit_time + ' ' + timezone,
+                commit.author.decode(encoding='UTF-8', errors='replace'))
+            self.metadata_misses += 1
+            return metadata
+
+    def stats(self):
+        """Counters showing how effective the cache has been
+
+        Returns
+        -------
+        dict
+        """
+        with self._lock:
+            return {
+                'objects': len(self._objects),
+                'size': self.size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'metadata_hits': self.metadata_hits,
+                'metadata_misses': self.metadata_misses,
+            }
+
+
+def object_cache(repo):
+    """The object cache for a repository
+
+    Parameters
+    ----------
+    repo : dulwich.repo.Repo
+
+    Returns
+    -------
+    ObjectCache
+    """
+    with _cache_lock:
+        try:
+            return _object_caches[repo]
+        except KeyError:
+            cache = _object_caches[repo] = ObjectCache(repo.object_store)
+            return cache
 
 
 def full_ref(repo, ref):
@@ -76,12 +461,7 @@ def full_ref(repo, ref):
     -------
     str
     """
-    refs = repo.refs.keys()
-    for ref_type in ['refs/heads/', 'refs/tags/']:
-        full_ref = ref_type + ref
-        if bytes(full_ref, encoding='ascii') in refs:
-            ref = full_ref
-    return ref
+    return ref_index(repo).full_ref(ref)
 
 
 def checkout(repo, ref=None):
@@ -98,14 +478,193 @@ def checkout(repo, ref=None):
     -------
     list
     """
+    tree_id = _commit_tree(repo, ref)
+    build_index_from_tree(
+        repo.path, repo.index_path(), repo.object_store, tree_id)
+    return [repo.object_store.iter_tree_contents(tree_id)]
+
+
+def resolve_commit(repo, ref=None):
+    """Resolve a ref to the id of the commit it points at
+
+    Branches and tags are expanded as per :func:`full_ref`, abbreviated ids
+    are expanded and annotated tags are peeled to their underlying commit.
+
+    Parameters
+    ----------
+    repo : dulwich.repo.Repo
+    ref : str
+        If omitted, the commit at HEAD is returned
+
+    Returns
+    -------
+    bytes
+    """
     if ref is None:
-        ref = repo.head()
+        ref = 'HEAD'
+    return ref_index(repo).resolve(ref)
+
+
+def _commit_tree(repo, ref):
+    return object_cache(repo)[resolve_commit(repo, ref)].tree
+
+
+def _lookup_path(repo, ref, path):
+    objects = object_cache(repo)
+    return tree_lookup_path(
+        objects.__getitem__, _commit_tree(repo, ref),
+        bytes(path, encoding='UTF-8'))
+
+
+def _iter_tree(objects, tree_id, path=b''):
+    """Walk a tree recursively, yielding an entry for each file"""
+    for entry in objects[tree_id].iteritems():
+        entry_path = posixpath.join(path, entry.path)
+        if S_ISDIR(entry.mode):
+            for child in _iter_tree(objects, entry.sha, entry_path):
+                yield child
+        else:
+            yield entry.in_path(path)
+
+
+def lookup_blob(repo, ref, path):
+    """Fetch the blob for a file as it was at a given ref
+
+    The blob is found by walking the path through the tree of the commit, so
+    no checkout is required.
+
+    The equivalent of :code:`git show <ref>:<path>`
+
+    Parameters
+    ----------
+    repo : dulwich.repo.Repo
+    ref : str
+    path : str
+        Path of the file relative to the repository root, using '/' as the
+        separator
+
+    Returns
+    -------
+    dulwich.objects.Blob
+        Its contents are read into memory in full
+    """
+    mode, sha = _lookup_path(repo, ref, path)
+    return object_cache(repo)[sha]
+
+
+def blob_id(file):
+    """The id git would give a file's contents as a blob
+
+    The equivalent of :code:`git hash-object <file>`
+
+    Parameters
+    ----------
+    file : pathlib.Path
+
+    Returns
+    -------
+    str
+    """
+    sha = sha1(b'blob %d\0' % file.stat().st_size)
+    with file.open('rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            sha.update(chunk)
+        f.close()
+    return sha.hexdigest()
+
+
+def _write_tree(objects, tree_id, target_folder):
+    Path.mkdir(target_folder, parents=True, exist_ok=True)
+    for entry in _iter_tree(objects, tree_id):
+        if S_ISGITLINK(entry.mode):
+            continue
+        target = Path(target_folder, entry.path.decode(encoding='UTF-8'))
+        Path.mkdir(target.parent, parents=True, exist_ok=True)
+        build_file_from_blob(objects[entry.sha], entry.mode, str(target))
+
+
+def export_tree(repo, ref, path, target_folder):
+    """Write a folder from the repository at a given ref to the file system
+
+    Only the objects beneath the given path are read from the object store.
+    Neither the index nor the working directory of the repository is touched.
+
+    The equivalent of :code:`git archive <ref> <path>` followed by an extract.
+
+    Parameters
+    ----------
+    repo : dulwich.repo.Repo
+    ref : str
+    path : str
+        Path of the folder relative to the repository root, using '/' as the
+        separator
+    target_folder : pathlib.Path
+    """
+    mode, sha = _lookup_path(repo, ref, path)
+    if not S_ISDIR(mode):
+        raise NotTreeError(sha)
+    _write_tree(object_cache(repo), sha, target_folder)
+
+
+def export_subtrees(repo, ref, path, names, target_folder):
+    """Write several sub-folders of a folder at a given ref to the file system
+
+    The tree for the parent folder is walked once and each named sub-folder
+    is written to a folder of the same name within the target folder.
+
+    Parameters
+    ----------
+    repo : dulwich.repo.Repo
+    ref : str
+    path : str
+        Path of the parent folder relative to the repository root, using '/'
+        as the separator
+    names : list
+        Names of the sub-folders to export
+    target_folder : pathlib.Path
+    """
+    objects = object_cache(repo)
+    mode, sha = _lookup_path(repo, ref, path)
+    wanted = set(bytes(name, encoding='UTF-8') for name in names)
+    for entry in objects[sha].iteritems():
+        if entry.path in wanted and S_ISDIR(entry.mode):
+            wanted.remove(entry.path)
+            _write_tree(
+                objects, entry.sha,
+                Path(target_folder, entry.path.decode(encoding='UTF-8')))
+    if wanted:
+        missing = sorted(name.decode(encoding='UTF-8') for name in wanted)
+        raise KeyError('Not found in %s: %s' % (path, ', '.join(missing)))
+
+
+def keyword_values(repo, ref):
+    """The values substituted for each keyword for a given ref
+
+    The values are derived from the commit at the ref and are only calculated
+    once for each commit.
+
+    Parameters
+    ----------
+    repo : dulwich.repo.Repo
+    ref : str
+
+    Returns
+    -------
+    dict
+    """
+    short_sha, commit_timestamp, author = object_cache(
+        repo).commit_metadata(resolve_commit(repo, ref))
+
+    if ref.startswith('refs/tags'):
+        version = 'Tag %s (%s)' % (ref, short_sha)
     else:
-        ref = bytes(full_ref(repo, ref), encoding='ascii')
-    index = repo.index_path()
-    tree_id = repo[ref].tree
-    build_index_from_tree(repo.path, index, repo.object_store, tree_id)
-    return [repo.object_store.iter_tree_contents(tree_id)]
+        version = short_sha
+
+    return {
+        'version': version,
+        'date': commit_timestamp,
+        'author': author
+    }
 
 
 def substitute_keywords(text, repo, ref):
@@ -124,38 +683,59 @@ def substitute_keywords(text, repo, ref):
     -------
     str
     """
-    new_text = ''
-    expanded_ref = full_ref(repo, ref)
-
     try:
-        sha = repo.refs[bytes(expanded_ref, encoding='ascii')]
-        short_sha = sha[:7].decode(encoding='ascii')
-
-        commit = repo.get_object(sha)
-        commit_time = strftime('%Y-%m-%d %H:%M:%S', gmtime(commit.commit_time))
-        timezone = format_timezone(
-            commit.commit_timezone).decode(encoding='ascii')
-        commit_timestamp = commit_time + ' ' + timezone
-        author = commit.author.decode(encoding='ascii')
-
-        if ref.startswith('refs/tags'):
-            version = 'Tag %s (%s)' % (ref, short_sha)
+        substitutions = keyword_values(repo, ref)
+    except KeyError:
+        logger.error('%s is not a valid branch or tag' % ref)
+        return ''
+
+    def replace(match):
+        key = match.group(1)
+        return '%s: %s' % (key, substitutions[key])
+
+    return _keyword_pattern.sub(replace, text)
+
+
+def _iter_lines(chunks):
+    pending = b''
+    for chunk in chunks:
+        lines = (pending + chunk).splitlines(keepends=True)
+        if lines and not lines[-1].endswith((b'\n', b'\r')):
+            pending = lines.pop()
         else:
-            version = short_sha
+            pending = b''
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
 
-        substitutions = {
-            'version': version,
-            'date': commit_timestamp,
-            'author': author
-        }
 
-        for line in text.splitlines(keepends=True):
-            for key, value in substitutions.items():
-                rexp = '%s:.*' % key
-                line = re.sub(rexp, '%s: %s' % (key, value), line)
-            new_text += line
+def write_substituted(chunks, target_file, repo, ref):
+    """Perform keyword substitution on a stream and write out the result
 
-    except KeyError:
-        logger.error('%s is not a valid branch or tag' % ref)
+    The content is processed a line at a time and written as it goes, so
+    the substituted copy is never held in memory as a whole. The chunks of a
+    dulwich blob, however, are already in memory, since dulwich inflates a
+    whole object, and resolves any deltas, when it is read. Memory use when
+    writing a blob therefore still grows with the size of the blob.
+
+    Parameters
+    ----------
+    chunks : iterable
+        The content to process as a sequence of bytes objects, e.g. the
+        chunks of a blob or a file read in blocks
+    target_file : file object
+        A file opened for writing in binary mode
+    repo : dulwich.repo.Repo
+    ref : str
+    """
+    substitutions = dict(
+        (bytes(key, encoding='ascii'), bytes(value, encoding='UTF-8'))
+        for key, value in keyword_values(repo, ref).items())
+
+    def replace(match):
+        key = match.group(1)
+        return key + b': ' + substitutions[key]
 
-    return new_text
+    for line in _iter_lines(chunks):
+        target_file.write(_keyword_bytes_pattern.sub(replace, line))
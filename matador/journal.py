@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+import json
+import os
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+
+class Journal(object):
+
+    """An append-only record of the progress of package deployments.
+
+    Each line of the journal is an entry in JSON. A run starts with the id of
+    the commit being deployed and records each ticket as it starts and
+    finishes and each script as it finishes. Every entry is flushed to disk
+    before the deployment carries on, so a run which is killed can be
+    resumed from the first step it had not completed.
+
+    Parameters
+    ----------
+    path : pathlib.Path
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._script_runs = Counter()
+        self.load()
+
+    def _write(self, event, **values):
+        values['event'] = event
+        values['time'] = time.time()
+        line = json.dumps(values) + '\n'
+        with self._lock:
+            with self.path.open('a') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+                f.close()
+
+    def entries(self):
+        """The entries in the journal, oldest first
+
+        Returns
+        -------
+        list
+            A dict for each entry. An entry left incomplete by a process
+            which was killed while writing it is ignored.
+        """
+        try:
+            lines = self.path.read_text().splitlines()
+        except FileNotFoundError:
+            return []
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+        return entries
+
+    def load(self):
+        """Read the state of the latest run from the journal
+
+        Sets commit_id, finished, the set of tickets_done and a count of the
+        successful runs of each ticket's scripts in scripts_done.
+        """
+        self.commit_id = None
+        self.finished = True
+        self.tickets_done = set()
+        self.scripts_done = Counter()
+        for entry in self.entries():
+            event = entry['event']
+            if event == 'start':
+                self.commit_id = entry['commit']
+                self.finished = False
+                self.tickets_done = set()
+                self.scripts_done = Counter()
+            elif event == 'finish':
+                self.finished = True
+            elif event == 'ticket-finished' and entry['succeeded']:
+                self.tickets_done.add(entry['ticket'])
+            elif event == 'script-finished' and entry['succeeded']:
+                self.scripts_done[(entry['ticket'], entry['script'])] += 1
+
+    @property
+    def resumable(self):
+        """Whether the latest run was left incomplete"""
+        return self.commit_id is not None and not self.finished
+
+    def start(self, package, commit_id):
+        """Record the start of a new run"""
+        self._write('start', package=package, commit=commit_id)
+        self.load()
+
+    def resume(self):
+        """Record the resumption of the latest run"""
+        self._write('resume', commit=self.commit_id)
+
+    def finish(self):
+        self._write('finish')
+        self.finished = True
+
+    def ticket_started(self, ticket):
+        self._write('ticket-started', ticket=ticket)
+
+    def ticket_finished(self, ticket, succeeded):
+        self._write('ticket-finished', ticket=ticket, succeeded=succeeded)
+
+    def script_finished(self, ticket, script, succeeded):
+        self._write(
+            'script-finished', ticket=ticket, script=script,
+            succeeded=succeeded)
+
+    def script_done(self, ticket, script):
+        """Whether a script has already been run by the run being resumed
+
+        A script which a ticket runs more than once is only considered done
+        as many times as it succeeded.
+
+        Parameters
+        ----------
+        ticket : str
+        script : str
+
+        Returns
+        -------
+        bool
+        """
+        with self._lock:
+            self._script_runs[(ticket, script)] += 1
+            return (
+                self._script_runs[(ticket, script)] <=
+                self.scripts_done[(ticket, script)])
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+_ledgers = {}
+_lock = threading.Lock()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scripts (
+    id INTEGER PRIMARY KEY,
+    script TEXT NOT NULL,
+    sha TEXT NOT NULL,
+    ticket TEXT,
+    commit_id TEXT,
+    applied REAL NOT NULL,
+    duration REAL,
+    succeeded INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scripts_script ON scripts (script, id);
+"""
+
+
+class Ledger(object):
+
+    """A record of every script run against an environment.
+
+    Each script is identified by its path, either within the repository or
+    relative to the environment's folder, and is recorded with the id of its
+    contents after keyword substitution, the ticket and commit from which
+    it was deployed, how long it took and whether it succeeded.
+
+    Parameters
+    ----------
+    path : pathlib.Path
+        The sqlite database holding the ledger
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            str(self.path), check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.executescript(_SCHEMA)
+
+    def applied(self, script, sha):
+        """Whether a script was last run with the same contents and succeeded
+
+        Parameters
+        ----------
+        script : str
+        sha : str
+
+        Returns
+        -------
+        bool
+        """
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT sha, succeeded FROM scripts WHERE script = ? '
+                'ORDER BY id DESC LIMIT 1', (script,)).fetchone()
+        return row is not None and row[0] == sha and bool(row[1])
+
+    def record(self, script, sha, ticket, commit_id, result):
+        """Record the outcome of running a script
+
+        Parameters
+        ----------
+        script : str
+        sha : str
+        ticket : str
+        commit_id : str
+        result : matador.executors.ScriptResult
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT INTO scripts (script, sha, ticket, commit_id, '
+                'applied, duration, succeeded) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (script, sha, ticket, commit_id, time.time(),
+                 result.duration, int(result.succeeded)))
+
+    def history(self, script):
+        """Every run of a script, oldest first
+
+        Parameters
+        ----------
+        script : str
+
+        Returns
+        -------
+        list
+            A tuple of the sha, ticket, commit id, time applied, duration and
+            whether it succeeded for each run
+        """
+        with self._lock:
+            return [
+                row[:5] + (bool(row[5]),)
+                for row in self._connection.execute(
+                    'SELECT sha, ticket, commit_id, applied, duration, '
+                    'succeeded FROM scripts WHERE script = ? ORDER BY id',
+                    (script,))]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def ledger(path):
+    """The ledger held in a file, shared by everything which uses it
+
+    Parameters
+    ----------
+    path : pathlib.Path
+
+    Returns
+    -------
+    Ledger
+    """
+    with _lock:
+        opened = _ledgers.get(str(path))
+        # The file may have been removed since, e.g. while the daemon was
+        # running, leaving the open connection unable to write.
+        if opened is None or not opened.path.exists():
+            opened = _ledgers[str(path)] = Ledger(path)
+        return opened
@@ -3,6 +3,7 @@ import sys
 import logging
 import argparse
 from matador.commands import commands
+from matador import daemon
 
 
 def _setup_logging(logging_destination='console', verbosity='INFO'):
@@ -27,9 +28,7 @@ def _setup_logging(logging_destination='console', verbosity='INFO'):
     logger.addHandler(logHandler)
 
 
-def execute_command():
-    """Entry point for command line executable."""
-
+def _parser():
     parser = argparse.ArgumentParser(
         description="Taming the bull: Change management for Agresso systems")
 
@@ -51,6 +50,39 @@ def execute_command():
         default='INFO',
         help='Logging level. DEBUG, INFO, ERROR or CRITICAL')
 
+    parser.add_argument(
+        '--no-daemon',
+        action='store_true',
+        help='Run the command here even if the matador daemon is running')
+
+    return parser
+
+
+def run_command(argv, session=None):
+    """Run a command given its command line arguments
+
+    Parameters
+    ----------
+    argv : list
+        The arguments, as they would follow 'matador' on the command line
+    session : callable
+        Returns the session for the command to use, if not a new one. It is
+        only called for commands which run against the project repository.
+    """
+    args, sub_args = _parser().parse_known_args(argv)
+    command = commands[args.command]
+    if session is not None and command.project_session:
+        session = session()
+    else:
+        session = None
+    command(session=session, argv=sub_args)
+
+
+def execute_command():
+    """Entry point for command line executable."""
+
+    parser = _parser()
+
     try:
         args, sub_args = parser.parse_known_args()
         _setup_logging(args.logging_destination, args.verbosity)
@@ -58,4 +90,14 @@ def execute_command():
         parser.print_help()
         sys.exit()
 
-    commands[args.command]()
+    if args.command == 'serve':
+        daemon.serve()
+        return
+
+    # Hand the command to the daemon, if it is running, to save starting up.
+    if not args.no_daemon:
+        exit_code = daemon.send_command(sys.argv[1:], args.verbosity)
+        if exit_code is not None:
+            sys.exit(exit_code)
+
+    commands[args.command](argv=sub_args)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+logger = logging.getLogger(__name__)
+
+
+def _ready(node, dependencies, done):
+    return set(dependencies.get(node, [])) <= done
+
+
+def run_graph(nodes, dependencies, function, jobs=1):
+    """Call a function for each node once the nodes it depends on are done
+
+    Nodes whose dependencies are satisfied are started in the order given,
+    with at most jobs of them running at once. With a single job, the calls
+    are made in the calling thread.
+
+    If any call raises an exception, no further nodes are started and, once
+    those already running have finished, the first exception is raised.
+
+    Parameters
+    ----------
+    nodes : list
+    dependencies : dict
+        The list of nodes on which each node depends
+    function : callable
+        Called with each node in turn
+    jobs : int
+        The maximum number of nodes to run concurrently
+    """
+    for node in nodes:
+        unknown = set(dependencies.get(node, [])) - set(nodes)
+        if unknown:
+            raise ValueError('%s depends on unknown %s' % (
+                node, ', '.join(str(item) for item in sorted(unknown))))
+
+    pending = list(nodes)
+    done = set()
+
+    if jobs == 1:
+        while pending:
+            ready = [
+                node for node in pending if _ready(node, dependencies, done)]
+            if not ready:
+                break
+            pending.remove(ready[0])
+            function(ready[0])
+            done.add(ready[0])
+    else:
+        running = {}
+        failure = None
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            while True:
+                if failure is None:
+                    for node in list(pending):
+                        if len(running) >= jobs:
+                            break
+                        if _ready(node, dependencies, done):
+                            pending.remove(node)
+                            running[pool.submit(function, node)] = node
+
+                if not running:
+                    break
+
+                finished, not_finished = wait(
+                    running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    node = running.pop(future)
+                    exception = future.exception()
+                    if exception is None:
+                        done.add(node)
+                    elif failure is None:
+                        failure = exception
+
+        if failure is not None:
+            raise failure
+
+    if pending:
+        raise ValueError('Circular dependency between %s' % (
+            ', '.join(str(node) for node in pending)))
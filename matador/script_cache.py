@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+_caches = {}
+_lock = threading.Lock()
+
+
+class ScriptCache(object):
+
+    """A cache of scripts as written out for deployment.
+
+    A script's contents after keyword substitution depend only on its blob,
+    the commit from which it is deployed and the value of the version
+    keyword, which names the tag when deploying from a tag. Each rendered
+    script is stored under the ids of the blob and commit and a hash of the
+    version. Scripts are served from the cache by a
+    hard link, where the file system allows, or else by a copy.
+
+    Files are evicted, least recently used first, once their total size
+    exceeds a limit, which is kept in the cache's config.json.
+
+    Parameters
+    ----------
+    folder : pathlib.Path
+
+    Attributes
+    ----------
+    hits : int
+        The scripts served from the cache by this instance
+    misses : int
+        The scripts looked for by this instance but not found
+    """
+
+    def __init__(self, folder):
+        self.folder = Path(folder)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._size = None
+        Path.mkdir(self.folder, parents=True, exist_ok=True)
+
+    @property
+    def _config_file(self):
+        return Path(self.folder, 'config.json')
+
+    @property
+    def max_size(self):
+        """The most bytes to hold before evicting files"""
+        try:
+            with self._config_file.open('r') as f:
+                return json.load(f)['max_size']
+        except (FileNotFoundError, ValueError, KeyError):
+            return DEFAULT_MAX_SIZE
+
+    @max_size.setter
+    def max_size(self, max_size):
+        with self._config_file.open('w') as f:
+            json.dump({'max_size': max_size}, f)
+            f.close()
+
+    def _path(self, blob_id, commit_id, version=None):
+        name = '%s-%s' % (blob_id, commit_id)
+        if version is not None:
+            name += '-' + hashlib.sha1(
+                version.encode('UTF-8')).hexdigest()[:12]
+        return Path(self.folder, blob_id[:2], name)
+
+    def _files(self):
+        return [
+            path for path in self.folder.glob('??/*')
+            if not path.name.startswith('.')]
+
+    def fetch(self, blob_id, commit_id, target, version=None):
+        """Write a cached script to a file, if it is in the cache
+
+        Parameters
+        ----------
+        blob_id : str
+        commit_id : str
+        target : pathlib.Path
+        version : str
+            The value substituted for the version keyword
+
+        Returns
+        -------
+        bool
+            Whether the script was found
+        """
+        path = self._path(blob_id, commit_id, version)
+        try:
+            if target.exists():
+                target.unlink()
+            try:
+                os.link(str(path), str(target))
+            except OSError:
+                if not path.exists():
+                    raise FileNotFoundError(str(path))
+                shutil.copyfile(str(path), str(target))
+            os.utime(str(path))
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return False
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def store(self, blob_id, commit_id, source, version=None):
+        """Add a rendered script to the cache
+
+        Parameters
+        ----------
+        blob_id : str
+        commit_id : str
+        source : pathlib.Path
+            The file holding the script
+        version : str
+            The value substituted for the version keyword
+        """
+        path = self._path(blob_id, commit_id, version)
+        Path.mkdir(path.parent, parents=True, exist_ok=True)
+        handle, temporary = tempfile.mkstemp(prefix='.', dir=str(path.parent))
+        os.close(handle)
+        shutil.copyfile(str(source), temporary)
+        try:
+            replaced_size = path.stat().st_size
+        except FileNotFoundError:
+            replaced_size = 0
+        os.replace(temporary, str(path))
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(f.stat().st_size for f in self._files())
+            else:
+                self._size += path.stat().st_size - replaced_size
+            over = self._size > self.max_size
+        if over:
+            self.prune()
+
+    def prune(self, max_size=None):
+        """Evict the least recently used files until within a size
+
+        Parameters
+        ----------
+        max_size : int
+            Defaults to the cache's limit
+
+        Returns
+        -------
+        int
+            The number of files evicted
+        """
+        if max_size is None:
+            max_size = self.max_size
+        with self._lock:
+            files = []
+            for path in self._files():
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+            files.sort()
+            size = sum(file_size for mtime, file_size, path in files)
+            evicted = 0
+            for mtime, file_size, path in files:
+                if size <= max_size:
+                    break
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                size -= file_size
+                evicted += 1
+            self._size = size
+        if evicted:
+            logger.debug('Evicted %d script(s) from %s' % (
+                evicted, self.folder))
+        return evicted
+
+    def stats(self):
+        """The contents of the cache
+
+        Returns
+        -------
+        dict
+        """
+        files = self._files()
+        return {
+            'files': len(files),
+            'size': sum(path.stat().st_size for path in files),
+            'max_size': self.max_size,
+        }
+
+
+def script_cache(folder):
+    """The script cache in a folder, shared by everything which uses it
+
+    Parameters
+    ----------
+    folder : pathlib.Path
+
+    Returns
+    -------
+    ScriptCache
+    """
+    with _lock:
+        try:
+            return _caches[str(folder)]
+        except KeyError:
+            cache = _caches[str(folder)] = ScriptCache(folder)
+            return cache
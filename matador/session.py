@@ -1,19 +1,26 @@
 #!/usr/bin/env python
+import copy
 import logging
+import threading
 import yaml
+from contextlib import contextmanager
 from dulwich.repo import Repo
 from dulwich.errors import NotGitRepository
 from configparser import ConfigParser
 from pathlib import Path
-from matador import git
+from matador import git, ledger, script_cache
 
 logger = logging.getLogger(__name__)
 
+# The session active in each thread, see Session.activate
+_current = threading.local()
 
-def get_environments(project_folder):
+
+def get_environments(project_folder, config_folder=None):
     """Fetch environment details from their config file."""
-    file_path = Path(
-        project_folder, 'config', 'environments.yml')
+    if config_folder is None:
+        config_folder = Path(project_folder, 'config')
+    file_path = Path(config_folder, 'environments.yml')
     try:
         file = file_path.open('r')
         environments = yaml.load(file)
@@ -27,10 +34,11 @@ def get_environments(project_folder):
         logger.error('environments.yml exists but is empty')
 
 
-def get_credentials(project_folder):
+def get_credentials(project_folder, config_folder=None):
     """Fetch credential details from their config file."""
-    file_path = Path(
-        project_folder, 'config', 'credentials.yml')
+    if config_folder is None:
+        config_folder = Path(project_folder, 'config')
+    file_path = Path(config_folder, 'credentials.yml')
     try:
         file = file_path.open('r')
         credentials = yaml.load(file)
@@ -74,19 +82,135 @@ def initialise_repository(proj_folder, repo_folder):
 
 class Session(object):
 
-    """A class to hold variables for a matador session."""
-
-    project_repo = None
-    matador_repo = None
-    environment = None
+    """The state of matador for a project and, once set, one environment.
+
+    A session may be created for each environment to be deployed, so that
+    several environments may be deployed at once within one process. Each
+    deployment script runs with the session for its deployment active, which
+    the deployment commands within it use via Session.current().
+
+    Parameters
+    ----------
+    environment : str
+        The name of the environment, if it is needed
+    share_objects : bool
+        Whether the matador repository should borrow objects from the
+        project repository via git alternates rather than holding its own
+        copies
+    project : str
+        The name of the project, for a session which deploys from an
+        artifact rather than a project repository
+    config_folder : pathlib.Path
+        The folder holding environments.yml and credentials.yml, by default
+        the project's config folder
+    """
+
+    def __init__(self, environment=None, share_objects=False, project=None,
+                 config_folder=None):
+        self.project = project
+        self.project_repo = None
+        self.project_folder = None
+        self.config_folder = config_folder
+        self.matador_project_folder = None
+        self.matador_repo = None
+        self.environment = None
+        self.environment_name = None
+        self.all_credentials = None
+        self.share_objects = share_objects
+        # Whether scripts are run through sqlplus sessions kept open for the
+        # duration of a command rather than a new sqlplus process for each.
+        self.reuse_sessions = False
+        # Whether a deployment stops at the first script to report an error.
+        self.fail_fast = False
+        # Seconds to allow each script before it is stopped, if set.
+        self.script_timeout = None
+        # The most scripts to run against the environment at once, if set.
+        # This overrides the environment's own max_sessions setting.
+        self.max_sessions = None
+        # Whether scripts already run successfully against the environment,
+        # with the same contents, are skipped.
+        self.incremental = False
+        # The folder of the ticket or package being deployed and the id of
+        # the commit from which it came.
+        self.deployment_folder = None
+        self.commit_id = None
+        # The journal of the package deployment in progress, if any.
+        self.journal = None
+        # The artifact being deployed, if not deploying from the repository.
+        self.artifact = None
+        # The Parallel group collecting deployment commands, if any.
+        self.group = None
+
+        self.initialise()
+        if environment is not None:
+            self.set_environment(environment)
 
     @classmethod
+    def current(cls):
+        """The session of the deployment running in the current thread
+
+        Returns
+        -------
+        Session
+        """
+        session = getattr(_current, 'session', None)
+        if session is None:
+            raise RuntimeError('No matador session is active')
+        return session
+
+    @contextmanager
+    def activate(self):
+        """Make this the current session within the current thread"""
+        previous = getattr(_current, 'session', None)
+        _current.session = self
+        try:
+            yield self
+        finally:
+            _current.session = previous
+
+    def copy(self, **changes):
+        """A copy of this session, sharing its repositories
+
+        Parameters
+        ----------
+        changes
+            Attributes to set on the copy, e.g. deployment_folder
+
+        Returns
+        -------
+        Session
+        """
+        session = copy.copy(self)
+        session.group = None
+        for key, value in changes.items():
+            setattr(session, key, value)
+        return session
+
+    def for_environment(self, environment):
+        """A copy of this session set to another environment
+
+        Parameters
+        ----------
+        environment : str
+
+        Returns
+        -------
+        Session
+        """
+        session = self.copy(environment=None)
+        session.set_environment(environment)
+        return session
+
     def initialise(self):
-        if self.project_repo is None:
-            self.project_repo = Repo.discover()
-            self.project_folder = Path(self.project_repo.path)
+        if self.matador_project_folder is None:
+            if self.project is None:
+                self.project_repo = Repo.discover()
+                self.project_folder = Path(self.project_repo.path)
+
+                self.project = self.project_folder.name
 
-            self.project = self.project_folder.name
+            if self.config_folder is None:
+                self.config_folder = Path(self.project_folder, 'config')
 
             self.matador_project_folder = Path(
                 Path.home(), '.matador', self.project)
@@ -94,13 +218,21 @@ class Session(object):
             self.matador_repository_folder = Path(
                 self.matador_project_folder, 'repository')
 
-            self.environments = get_environments(self.project_folder)
+            self.environments = get_environments(
+                self.project_folder, self.config_folder)
         else:
             return
 
-    @classmethod
-    def _initialise_matador_repository(self):
-        """Initialise a git repository for matador to use."""
+    def _initialise_matador_repository(self, share_objects=None):
+        """Initialise a git repository for matador to use.
+
+        If share_objects is set, the repository is linked to the project
+        repository's objects, provided both are on the same file system.
+        Otherwise, objects are copied into it when fetching.
+        """
+        if share_objects is None:
+            share_objects = self.share_objects
+
         Path.mkdir(
             self.matador_project_folder, parents=True, exist_ok=True)
         Path.mkdir(
@@ -113,19 +245,37 @@ class Session(object):
                 self.project_folder, self.matador_repository_folder)
 
         self.matador_repo = repo
+        if share_objects:
+            self.share_project_objects()
+
+    def share_project_objects(self):
+        """Borrow objects from the project repository rather than copy them
+
+        Sets share_objects and, if the matador repository is already open,
+        links it to the project repository's objects, provided both are on
+        the same file system.
+        """
+        self.share_objects = True
+        if self.matador_repo is None or self.project_repo is None:
+            return
+        if not git.share_objects(self.project_repo, self.matador_repo):
+            logger.info(
+                'Project repository is on a different file system. '
+                'Objects will be fetched instead of shared.')
 
-    @classmethod
     def set_environment(self, environment):
         """Set a specific environment for those commands which require it."""
 
-        if self.project_repo is None:
-            self.initialise()
+        self.initialise()
 
         if self.environment is None:
-            self._initialise_matador_repository()
+            # Without a project repository, e.g. when deploying an artifact,
+            # there is nothing for a matador repository to fetch from.
+            if self.matador_repo is None and self.project_repo is not None:
+                self._initialise_matador_repository()
+            self.environment_name = environment
             self.environment = self.environments[environment]
-            credentials = get_credentials(self.project_folder)
-            self.credentials = credentials[environment]
+            self.credentials = self.load_credentials()[environment]
 
             self.matador_environment_folder = Path(
                 self.matador_project_folder, environment)
@@ -143,20 +293,39 @@ class Session(object):
         else:
             return
 
-    @classmethod
+    def ledger(self):
+        """The record of the scripts run against the environment
+
+        Returns
+        -------
+        matador.ledger.Ledger
+        """
+        return ledger.ledger(
+            Path(self.matador_environment_folder, 'ledger.sqlite'))
+
+    def script_cache(self):
+        """The cache of rendered scripts for the project
+
+        Returns
+        -------
+        matador.script_cache.ScriptCache
+        """
+        return script_cache.script_cache(
+            Path(self.matador_project_folder, 'cache'))
+
+    def load_credentials(self):
+        """The credentials for every environment, read once per session"""
+        if self.all_credentials is None:
+            self.all_credentials = get_credentials(
+                self.project_folder, self.config_folder)
+        return self.all_credentials
+
     def update_repository(self):
         """Fetch all from the project repo to the matador repo."""
 
-        if self.project_repo is None:
-            self.initialise()
+        self.initialise()
 
         if self.matador_repo is None:
             self._initialise_matador_repository()
 
         git.fetch_all(self.project_repo, self.matador_repo)
-
-    @classmethod
-    def clear(self):
-        self.project_repo = None
-        self.matador_repo = None
-        self.environment = None
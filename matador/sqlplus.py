@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+import logging
+import re
+import subprocess
+import threading
+import time
+import queue
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Restores sqlplus's default error handling so that a WHENEVER setting made
+# by one script does not carry over into the next.
+_RESET = b'WHENEVER SQLERROR CONTINUE NONE\nWHENEVER OSERROR CONTINUE NONE\n'
+
+# The longest line read from sqlplus in one go. Anything longer is split.
+MAX_LINE_LENGTH = 64 * 1024
+
+ERROR_PATTERN = re.compile(r'\b(ORA|SP2|PLS)-\d{4,5}\b')
+
+_idle_sessions = {}
+_lock = threading.Lock()
+
+
+class SessionClosed(Exception):
+
+    """Raised when a session ends before the script it is running."""
+
+    def __init__(self, message, errors=None):
+        super(SessionClosed, self).__init__(message)
+        self.errors = errors or []
+
+
+def log_output(line, errors):
+    """Log a line of sqlplus output, noting it if it reports an error
+
+    Parameters
+    ----------
+    line : bytes
+    errors : list
+        Lines reporting errors are appended to this list
+
+    Returns
+    -------
+    bool
+        Whether the line reported an error
+    """
+    line = line.decode('utf-8', errors='replace').rstrip('\r\n')
+    if ERROR_PATTERN.search(line):
+        errors.append(line)
+        logger.error(line)
+        return True
+    logger.info(line)
+    return False
+
+
+class SqlPlusSession(object):
+
+    """A long lived sqlplus process through which scripts are run in turn.
+
+    After each script, a PROMPT command echoes a unique marker. The output of
+    the process is logged until that marker appears, at which point the
+    script has finished and the session is ready for the next one.
+
+    If a script causes sqlplus to exit, e.g. through EXIT or WHENEVER
+    SQLERROR EXIT, or it is stopped for taking too long or failing, the
+    session is closed and SessionClosed is raised.
+
+    Parameters
+    ----------
+    command : list
+        The sqlplus command line, including the connection string
+    """
+
+    def __init__(self, command):
+        self.command = command
+        self.process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT)
+        self._output = queue.Queue()
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def _read(self):
+        while True:
+            line = self.process.stdout.readline(MAX_LINE_LENGTH)
+            if not line:
+                break
+            self._output.put(line)
+        self._output.put(None)
+
+    @property
+    def key(self):
+        return tuple(self.command)
+
+    @property
+    def alive(self):
+        return self.process.poll() is None
+
+    def _write(self, script, marker):
+        try:
+            for chunk in script:
+                self.process.stdin.write(chunk)
+            self.process.stdin.write(b'\n' + _RESET)
+            self.process.stdin.write(bytes('PROMPT %s\n' % marker, 'ascii'))
+            self.process.stdin.flush()
+        except (BrokenPipeError, ValueError):
+            # sqlplus has exited or been killed, which the reader will find.
+            pass
+
+    def run(self, script, timeout=None, fail_fast=False):
+        """Run a script and wait for it to finish
+
+        Parameters
+        ----------
+        script : iterable
+            The script as a sequence of bytes objects
+        timeout : float
+            Seconds to wait for the script, including the time taken to send
+            it, before killing the session
+        fail_fast : bool
+            Whether to kill the session as soon as an error is reported
+
+        Returns
+        -------
+        list
+            The lines of output which reported errors
+        """
+        marker = 'MATADOR-%s' % uuid.uuid4().hex
+        errors = []
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+
+        # The script is written on a thread of its own, so that sqlplus
+        # stalling while a long script is sent cannot outlast the timeout.
+        writer = threading.Thread(
+            target=self._write, args=(script, marker), daemon=True)
+        writer.start()
+        try:
+            while True:
+                try:
+                    if timeout is None:
+                        line = self._output.get()
+                    else:
+                        line = self._output.get(
+                            timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    self.kill()
+                    raise SessionClosed(
+                        'Timed out after %s seconds' % timeout, errors)
+                if line is None:
+                    self.close()
+                    raise SessionClosed(
+                        'sqlplus exited before the script completed', errors)
+                if line.decode('utf-8', errors='replace').rstrip() == marker:
+                    return errors
+                if log_output(line, errors) and fail_fast:
+                    self.kill()
+                    raise SessionClosed('Stopped at the first error', errors)
+        finally:
+            writer.join()
+
+    def kill(self):
+        """End the sqlplus process immediately"""
+        self.process.kill()
+        self.close()
+
+    def close(self):
+        """End the sqlplus process"""
+        if self.alive:
+            try:
+                self.process.stdin.write(b'EXIT\n')
+                self.process.stdin.close()
+            except BrokenPipeError:
+                pass
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        else:
+            self.process.wait()
+        self._reader.join()
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        self.process.stdout.close()
+
+
+def acquire_session(command):
+    """Take an idle session for a command line or start a new one
+
+    Sessions are kept for each connection, whichever folder the scripts they
+    run are in.
+
+    Parameters
+    ----------
+    command : list
+
+    Returns
+    -------
+    SqlPlusSession
+    """
+    key = tuple(command)
+    with _lock:
+        sessions = _idle_sessions.get(key, [])
+        while sessions:
+            session = sessions.pop()
+            if session.alive:
+                return session
+            session.close()
+    return SqlPlusSession(command)
+
+
+def release_session(session):
+    """Return a session to those available for reuse
+
+    Parameters
+    ----------
+    session : SqlPlusSession
+    """
+    if session.alive:
+        with _lock:
+            _idle_sessions.setdefault(session.key, []).append(session)
+
+
+def run_script(command, script, timeout=None, fail_fast=False):
+    """Run a script through a reusable sqlplus session
+
+    Parameters
+    ----------
+    command : list
+    script : iterable
+        The script as a sequence of bytes objects
+    timeout : float
+    fail_fast : bool
+
+    Returns
+    -------
+    tuple
+        The exit code of sqlplus, which is 0 if the session is still open,
+        and the lines of output which reported errors
+    """
+    session = acquire_session(command)
+    try:
+        return 0, session.run(script, timeout, fail_fast)
+    except SessionClosed as e:
+        # A script which ends with EXIT, as many do, closes the session
+        # without anything having gone wrong.
+        if session.process.returncode == 0 and not e.errors:
+            return 0, []
+        logger.error(str(e))
+        return session.process.returncode or 1, e.errors + [str(e)]
+    finally:
+        release_session(session)
+
+
+def close_sessions():
+    """End every idle sqlplus session"""
+    with _lock:
+        sessions = [
+            session
+            for key_sessions in _idle_sessions.values()
+            for session in key_sessions]
+        _idle_sessions.clear()
+    for session in sessions:
+        session.close()
@@ -28,12 +28,14 @@ setup(
     url='http://www.empiria.co.uk',
     packages=find_packages(),
     install_requires=['pyyaml', 'dulwich'],
+    python_requires='>=3.7',
     license='The MIT License (MIT)',
     description='Change management for Agresso systems',
     classifiers=[
         'Development Status :: 2 - Pre-Alpha',
         'Environment :: Console',
         'License :: OSI Approved :: MIT License',
-        'Natural Language :: English'
+        'Natural Language :: English',
+        'Programming Language :: Python :: 3 :: Only',
         ]
     )
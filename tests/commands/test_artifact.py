@@ -0,0 +1,213 @@
+import os
+import pytest
+import zipfile
+import matador.commands as cmd
+import globals as gbl
+from matador import daemon
+from matador.artifact import Artifact, ArtifactWriter
+from matador.commands.deployment import deployment
+from matador.executors import ScriptResult
+from pathlib import Path
+
+
+def test_artifact(tmpdir):
+    folder = Path(str(tmpdir))
+    source = Path(folder, 'source', 'deploy.py')
+    source.parent.mkdir()
+    source.write_text('print("deployed")\n')
+    script = Path(folder, 'script.sql')
+    script.write_text('select 1 from dual;\n')
+
+    path = Path(folder, 'package.zip')
+    writer = ArtifactWriter(
+        path, project=gbl.project, package='test_package', commit='abc')
+    writer.add_folder(source.parent, 'tickets/A001')
+    writer.add_script(
+        script, Path('src', 'script.sql'), 'HEAD', 'abc')
+    writer.close()
+
+    artifact = Artifact(path)
+    assert artifact.project == gbl.project
+    assert artifact.package == 'test_package'
+    assert artifact.commit_id == 'abc'
+    assert artifact.script_commit(Path('src', 'script.sql'), 'HEAD') == 'abc'
+
+    target = Path(folder, 'target')
+    artifact.extract_folder('tickets/A001', target)
+    assert Path(target, 'deploy.py').read_text() == source.read_text()
+    extracted = artifact.extract_script(
+        Path('src', 'script.sql'), 'HEAD', target)
+    assert extracted.read_text() == script.read_text()
+    with pytest.raises(KeyError):
+        artifact.extract_script(Path('src', 'other.sql'), 'HEAD', target)
+    artifact.close()
+
+
+def test_artifact_detects_corruption(tmpdir):
+    folder = Path(str(tmpdir))
+    source = Path(folder, 'deploy.py')
+    source.write_text('print("deployed")\n')
+    path = Path(folder, 'package.zip')
+    writer = ArtifactWriter(
+        path, project=gbl.project, package='test_package', commit='abc')
+    writer.add_file(source, 'tickets/A001/deploy.py')
+    writer.manifest['files']['tickets/A001/deploy.py']['sha256'] = '0' * 64
+    writer.close()
+
+    artifact = Artifact(path)
+    with pytest.raises(ValueError):
+        artifact.extract_folder('tickets/A001', Path(folder, 'target'))
+    assert not Path(folder, 'target', 'deploy.py').exists()
+    artifact.close()
+
+
+@pytest.fixture
+def runs(monkeypatch):
+    """The name and contents of each script run by a deployment"""
+    runs = []
+
+    def run_sql_script(session, logger, file_path):
+        runs.append((Path(file_path).name, Path(file_path).read_text()))
+        return ScriptResult(0, [], 0.1)
+
+    monkeypatch.setattr(deployment, 'run_sql_script', run_sql_script)
+    return runs
+
+
+def _build_artifact(project_repo, tmpdir):
+    ticket = 'test-ticket'
+    script_file = Path(project_repo.path, 'src', 'script.sql')
+    package_folder = Path(
+        project_repo.path, 'src', 'db_objects', 'packages', 'test_pkg')
+    package_folder.mkdir(parents=True)
+    script_file.write_text('-- version:\nselect 1 from dual;\n')
+    spec_file = Path(package_folder, 'test_pkg.pks')
+    spec_file.write_text('-- version:\ncreate package test_pkg as\n')
+    body_file = Path(package_folder, 'test_pkg.pkb')
+    body_file.write_text('-- version:\ncreate package body test_pkg as\n')
+
+    deploy_file = Path(
+        project_repo.path, 'deploy', 'tickets', ticket, 'deploy.py')
+    deploy_file.parent.mkdir(parents=True)
+    deploy_file.write_text(
+        'from pathlib import Path\n'
+        'from matador.session import Session\n'
+        'from matador.commands.deployment import *\n'
+        'session = Session.current()\n'
+        'DeploySqlScript("src/script.sql", "HEAD")\n'
+        'DeployOraclePackage("test_pkg", "HEAD")\n'
+        'Path(session.deployment_folder, "deployed").write_text(\n'
+        '    session.environment_name)\n')
+
+    package = 'test_package'
+    package_file = Path(
+        project_repo.path, 'deploy', 'packages', package, 'tickets.yml')
+    package_file.parent.mkdir(parents=True)
+    package_file.write_text('- %s\n' % ticket)
+
+    project_repo.stage([
+        bytes(str(path.relative_to(project_repo.path)), encoding='UTF-8')
+        for path in (
+            script_file, spec_file, body_file, deploy_file, package_file)])
+    commit = project_repo.do_commit(message=b'Create test package')
+
+    output = Path(str(tmpdir), 'package.zip')
+    cmd.BuildPackage(package=package, commit='HEAD', output=str(output))
+    return output, commit.decode(encoding='ascii')
+
+
+def test_build_and_deploy_artifact(project_repo, tmpdir, runs):
+    ticket = 'test-ticket'
+    output, commit = _build_artifact(project_repo, tmpdir)
+    with zipfile.ZipFile(str(output)) as archive:
+        names = archive.namelist()
+    assert 'manifest.json' in names
+    assert 'package/tickets.yml' in names
+    assert 'tickets/%s/deploy.py' % ticket in names
+    for script in ('script.sql', 'test_pkg.pks', 'test_pkg.pkb'):
+        assert any(
+            name.startswith('scripts/') and name.endswith('/' + script)
+            for name in names)
+
+    # The artifact is deployed without the project repository, running the
+    # scripts as they were rendered when it was built.
+    config_folder = Path(project_repo.path, 'config')
+    os.chdir(str(tmpdir))
+    cmd.DeployArtifact(
+        environment='test', artifact=str(output),
+        config=str(config_folder))
+
+    version = '-- version: %s\n' % commit[:7]
+    assert runs == [
+        ('script.sql', version + 'select 1 from dual;\n'),
+        ('test_pkg.pks', version + 'create package test_pkg as\n'),
+        ('test_pkg.pkb', version + 'create package body test_pkg as\n')]
+    deployed_file = Path(
+        Path.home(), '.matador', gbl.project, 'test', 'tickets', ticket,
+        'deployed')
+    assert deployed_file.read_text() == 'test'
+
+
+def test_build_fails_for_unresolved_scripts(project_repo, tmpdir):
+    ticket = 'test-ticket'
+    deploy_file = Path(
+        project_repo.path, 'deploy', 'tickets', ticket, 'deploy.py')
+    deploy_file.parent.mkdir(parents=True)
+    deploy_file.write_text(
+        'from matador.commands.deployment import *\n'
+        'script = "src/script.sql"\n'
+        'DeploySqlScript(script, "HEAD")\n')
+    package_file = Path(
+        project_repo.path, 'deploy', 'packages', 'test_package',
+        'tickets.yml')
+    package_file.parent.mkdir(parents=True)
+    package_file.write_text('- %s\n' % ticket)
+    project_repo.stage([
+        bytes(str(path.relative_to(project_repo.path)), encoding='UTF-8')
+        for path in (deploy_file, package_file)])
+    project_repo.do_commit(message=b'Create test package')
+
+    output = Path(str(tmpdir), 'package.zip')
+    with pytest.raises(ValueError) as e:
+        cmd.BuildPackage(
+            package='test_package', commit='HEAD', output=str(output))
+    assert 'tickets/test-ticket/deploy.py' in str(e.value)
+    assert 'DeploySqlScript at line 3' in str(e.value)
+    assert not output.exists()
+
+
+def test_deploy_artifact_outside_repository(project_repo, tmpdir, runs):
+    ticket = 'test-ticket'
+    output, commit = _build_artifact(project_repo, tmpdir)
+    config_folder = Path(project_repo.path, 'config')
+    deploy_folder = Path(str(tmpdir), 'deploy')
+    deploy_folder.mkdir()
+    os.chdir(str(deploy_folder))
+    deployed_file = Path(
+        Path.home(), '.matador', gbl.project, 'uat', 'tickets', ticket,
+        'deployed')
+
+    plan = Path(str(deploy_folder), 'plan.yml')
+    plan.write_text(
+        '- deploy-artifact:\n'
+        '    environment: uat\n'
+        '    artifact: %s\n'
+        '    config: %s\n' % (output, config_folder))
+    cmd.Batch(plan=str(plan))
+    assert deployed_file.read_text() == 'uat'
+    deployed_file.unlink()
+
+    # The daemon lets the command create its own session.
+    server = daemon.Daemon(Path(str(tmpdir), 'daemon.sock'))
+    try:
+        exit_code = server.run({
+            'argv': [
+                'deploy-artifact', '-e', 'uat', '-a', str(output),
+                '--config', str(config_folder)],
+            'cwd': str(deploy_folder)}, lambda message: None)
+    finally:
+        server.server_close()
+    assert exit_code == 0
+    assert deployed_file.read_text() == 'uat'
+    assert not server.sessions
+    assert len(runs) == 6
@@ -0,0 +1,82 @@
+import pytest
+import matador.commands as cmd
+import globals as gbl
+from matador.commands.batch import read_plan
+from matador.management import run_command
+from pathlib import Path
+
+
+def test_read_plan():
+    steps = read_plan([
+        {'create-ticket': {'ticket': 'A001'}},
+        {'deploy-ticket': {'environment': 'test', 'ticket': 'A001',
+                           'fail-fast': True}},
+    ])
+    assert steps == [
+        ('create-ticket', {'ticket': 'A001'}),
+        ('deploy-ticket', {
+            'environment': 'test', 'ticket': 'A001', 'fail_fast': True}),
+    ]
+
+    with pytest.raises(ValueError):
+        read_plan(['create-ticket'])
+
+
+def test_batch(project_repo, tmpdir):
+    plan = Path(str(tmpdir), 'plan.yml')
+    plan.write_text(
+        '- create-ticket:\n'
+        '    ticket: test-ticket\n'
+        '- deploy-ticket:\n'
+        '    environment: test\n'
+        '    ticket: test-ticket\n'
+        '    commit: HEAD\n'
+        '- deploy-ticket:\n'
+        '    environment: test\n'
+        '    ticket: missing-ticket\n'
+        '- create-ticket:\n'
+        '    ticket: never-created\n')
+
+    with pytest.raises(KeyError):
+        cmd.Batch(plan=str(plan))
+
+    tickets_folder = Path(
+        Path.home(), '.matador', gbl.project, 'test', 'tickets')
+    assert Path(tickets_folder, 'test-ticket', 'deploy.py').exists()
+    assert not Path(
+        project_repo.path, 'deploy', 'tickets', 'never-created').exists()
+
+
+def test_read_plan_checks_commands():
+    with pytest.raises(ValueError, match='unknown command'):
+        read_plan([{'no-such-command': {}}], cmd.commands)
+
+    with pytest.raises(ValueError, match='requires environment'):
+        read_plan([{'deploy-ticket': {'ticket': 'A001'}}], cmd.commands)
+
+    with pytest.raises(ValueError, match='Step 2: deploy-ticket has no '
+                                         'argument comit'):
+        read_plan([
+            {'create-ticket': {'ticket': 'A001'}},
+            {'deploy-ticket': {
+                'environment': 'test', 'ticket': 'A001', 'comit': 'v1.2'}},
+        ], cmd.commands)
+
+    steps = read_plan(
+        [{'deploy-ticket': {'environment': 'test', 'ticket': 'A001'}}],
+        cmd.commands)
+    assert steps == [
+        ('deploy-ticket', {'environment': 'test', 'ticket': 'A001'})]
+
+
+def test_batch_from_command_line(project_repo, tmpdir):
+    plan = Path(str(tmpdir), 'plan.yml')
+    plan.write_text(
+        '- create-ticket:\n'
+        '    ticket: test-ticket\n')
+
+    run_command(['batch', str(plan)])
+
+    assert Path(
+        project_repo.path, 'deploy', 'tickets', 'test-ticket',
+        'deploy.py').exists()
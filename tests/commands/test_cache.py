@@ -0,0 +1,31 @@
+import matador.commands as cmd
+import globals as gbl
+from matador.management import run_command
+from pathlib import Path
+
+
+def test_cache(project_repo):
+    cache_folder = Path(Path.home(), '.matador', gbl.project, 'cache')
+    script = Path(cache_folder, 'aa', 'a' * 40 + '-' + 'c' * 40)
+    script.parent.mkdir(parents=True)
+    script.write_text('select 1 from dual;\n')
+
+    cmd.Cache(action='stats')
+    assert script.exists()
+
+    cmd.Cache(action='prune', max_size=0)
+    assert not script.exists()
+    assert Path(cache_folder, 'config.json').exists()
+
+
+def test_cache_from_command_line(project_repo):
+    cache_folder = Path(Path.home(), '.matador', gbl.project, 'cache')
+    script = Path(cache_folder, 'aa', 'a' * 40 + '-' + 'c' * 40)
+    script.parent.mkdir(parents=True)
+    script.write_text('select 1 from dual;\n')
+
+    run_command(['cache', 'stats'])
+    assert script.exists()
+
+    run_command(['cache', 'prune', '--max-size', '0'])
+    assert not script.exists()
@@ -1,4 +1,7 @@
+import pytest
 import matador.commands as cmd
+import yaml
+from matador.commands.deploy_package import read_tickets
 import globals as gbl
 from pathlib import Path
 
@@ -72,3 +75,103 @@ def test_remove_package(project_repo):
         Path.home(), '.matador', gbl.project, env, 'packages', package,
         'remove.py')
     assert checked_out_file.exists()
+
+
+def test_read_tickets():
+    entries = yaml.load(
+        '- 1001\n'
+        '- A002: [1001]\n'
+        '- A003:\n'
+        '    depends: 1001\n'
+        '- A004\n')
+    tickets, dependencies = read_tickets(entries)
+    assert tickets == ['1001', 'A002', 'A003', 'A004']
+    assert dependencies == {'A002': ['1001'], 'A003': ['1001']}
+
+    tickets, dependencies = read_tickets(['A001', 'A002', 'A003'])
+    assert dependencies == {'A002': ['A001'], 'A003': ['A002']}
+
+
+def test_deploy_package_to_several_environments(project_repo):
+    ticket = 'test-ticket'
+    ticket_folder = Path(project_repo.path, 'deploy', 'tickets', ticket)
+    deploy_file = Path(ticket_folder, 'deploy.py')
+    ticket_folder.mkdir(parents=True)
+    deploy_file.write_text(
+        'from pathlib import Path\n'
+        'from matador.session import Session\n'
+        'session = Session.current()\n'
+        'Path(session.deployment_folder, "deployed").write_text(\n'
+        '    session.environment_name)\n')
+
+    package = 'test_package'
+    package_folder = Path(project_repo.path, 'deploy', 'packages', package)
+    package_file = Path(package_folder, 'tickets.yml')
+    package_folder.mkdir(parents=True)
+    package_file.write_text('- %s\n' % ticket)
+
+    project_repo.stage([
+        bytes(str(deploy_file.relative_to(project_repo.path)), 'UTF-8'),
+        bytes(str(package_file.relative_to(project_repo.path)), 'UTF-8')])
+    project_repo.do_commit(message=b'Create test package')
+
+    cmd.DeployPackage(environment='test,uat', package=package, commit='HEAD')
+
+    for env in ('test', 'uat'):
+        deployed_file = Path(
+            Path.home(), '.matador', gbl.project, env, 'tickets', ticket,
+            'deployed')
+        assert deployed_file.read_text() == env
+
+
+def test_resume_package(project_repo, tmpdir):
+    log_file = Path(str(tmpdir), 'log')
+    fail_file = Path(str(tmpdir), 'fail')
+    tickets = ['test-ticket-1', 'test-ticket-2', 'test-ticket-3']
+    paths = []
+    for ticket in tickets:
+        deploy_file = Path(
+            project_repo.path, 'deploy', 'tickets', ticket, 'deploy.py')
+        deploy_file.parent.mkdir(parents=True)
+        deploy_file.write_text(
+            'from pathlib import Path\n'
+            'if Path(%r).exists() and %r.endswith("2"):\n'
+            '    raise RuntimeError("failed")\n'
+            'with open(%r, "a") as f:\n'
+            '    f.write("%s\\n")\n' % (
+                str(fail_file), ticket, str(log_file), ticket))
+        paths.append(deploy_file)
+
+    package = 'test_package'
+    package_file = Path(
+        project_repo.path, 'deploy', 'packages', package, 'tickets.yml')
+    package_file.parent.mkdir(parents=True)
+    package_file.write_text(''.join('- %s\n' % ticket for ticket in tickets))
+    paths.append(package_file)
+
+    project_repo.stage([
+        bytes(str(path.relative_to(project_repo.path)), encoding='UTF-8')
+        for path in paths])
+    project_repo.do_commit(message=b'Create test package')
+
+    fail_file.touch()
+    with pytest.raises(RuntimeError):
+        cmd.DeployPackage(environment='test', package=package, commit='HEAD')
+    assert log_file.read_text() == 'test-ticket-1\n'
+
+    fail_file.unlink()
+    other_file = Path(project_repo.path, 'other_file')
+    other_file.touch()
+    project_repo.stage([b'other_file'])
+    project_repo.do_commit(message=b'Move on')
+    with pytest.raises(ValueError):
+        cmd.DeployPackage(
+            environment='test', package=package, commit='HEAD', resume=True)
+    assert log_file.read_text() == 'test-ticket-1\n'
+
+    cmd.DeployPackage(environment='test', package=package, resume=True)
+    assert log_file.read_text() == (
+        'test-ticket-1\ntest-ticket-2\ntest-ticket-3\n')
+
+    cmd.DeployPackage(environment='test', package=package, resume=True)
+    assert log_file.read_text().count('\n') == 3
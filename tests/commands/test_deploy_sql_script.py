@@ -0,0 +1,131 @@
+from matador.commands.deployment import deployment
+from matador.commands.deployment.deploy_sql_script import (
+    DeploySqlScript, _fetch_script, prefetch_scripts, referenced_scripts)
+from matador.executors import ScriptResult
+from matador import git
+from matador.script_cache import ScriptCache
+from pathlib import Path
+
+
+def test_fetch_script(tmpdir, project_repo):
+    script_folder = Path(project_repo.path, 'src', 'scripts')
+    script_folder.mkdir(parents=True)
+    script_file = Path(script_folder, 'test.sql')
+    script_file.write_text('-- version:\nselect 1 from dual;\n')
+    script_path = script_file.relative_to(project_repo.path)
+    project_repo.stage([bytes(str(script_path), encoding='UTF-8')])
+    project_repo.do_commit(message=b'Create test script')
+    script_file.unlink()
+
+    short_sha = project_repo.head()[:7].decode(encoding='ascii')
+    target_folder = Path(str(tmpdir))
+    target_script = _fetch_script(
+        project_repo, script_path, 'master', target_folder)
+
+    assert target_script == Path(target_folder, 'test.sql')
+    assert target_script.read_text() == (
+        '-- version: %s\nselect 1 from dual;\n' % short_sha)
+    assert not script_file.exists()
+
+
+def test_prefetch_scripts(tmpdir, project_repo):
+    script_folder = Path(project_repo.path, 'src', 'scripts')
+    script_folder.mkdir(parents=True)
+    script_file = Path(script_folder, 'test.sql')
+    script_file.write_text('select 1 from dual;\n')
+    script_path = script_file.relative_to(project_repo.path)
+    project_repo.stage([bytes(str(script_path), encoding='UTF-8')])
+    project_repo.do_commit(message=b'Create test script')
+
+    target_folder = Path(str(tmpdir), 'ticket')
+    target_folder.mkdir()
+    deploy_file = Path(target_folder, 'deploy.py')
+    deploy_file.write_text(
+        "DeploySqlScript('src/scripts/test.sql', 'master')\n"
+        "DeploySqlScript('local.sql')\n"
+        "DeployOraclePackage('test_package', 'v1')\n"
+        "DeploySqlScript(name, 'master')\n")
+
+    unresolved = []
+    assert referenced_scripts(deploy_file, unresolved) == [
+        (Path('src/scripts/test.sql'), 'master'),
+        (Path('src/db_objects/packages/test_package/test_package.pks'), 'v1'),
+        (Path('src/db_objects/packages/test_package/test_package.pkb'), 'v1'),
+    ]
+    assert unresolved == ['DeploySqlScript at line 4']
+
+    prefetch_scripts(project_repo, deploy_file, target_folder)
+    target_script = Path(target_folder, 'test.sql')
+    assert target_script.read_text() == 'select 1 from dual;\n'
+
+    # The prefetched script is used as it stands, once.
+    target_script.write_text('prefetched')
+    _fetch_script(project_repo, script_path, 'master', target_folder)
+    assert target_script.read_text() == 'prefetched'
+    _fetch_script(project_repo, script_path, 'master', target_folder)
+    assert target_script.read_text() == 'select 1 from dual;\n'
+
+
+def test_incremental(session, monkeypatch):
+    runs = []
+
+    def run_sql_script(session, logger, file_path):
+        runs.append(Path(file_path).name)
+        return ScriptResult(0, [], 0.1)
+
+    monkeypatch.setattr(deployment, 'run_sql_script', run_sql_script)
+    session.set_environment('test')
+    ticket_folder = Path(session.matador_tickets_folder, 'A001')
+    ticket_folder.mkdir()
+    script = Path(ticket_folder, 'test.sql')
+    script.write_text('select 1 from dual;\n')
+    session = session.copy(deployment_folder=ticket_folder, incremental=True)
+
+    DeploySqlScript('test.sql', session=session)
+    DeploySqlScript('test.sql', session=session)
+    assert runs == ['test.sql']
+    assert session.ledger().applied(
+        'tickets/A001/test.sql', git.blob_id(script))
+
+    script.write_text('select 2 from dual;\n')
+    DeploySqlScript('test.sql', session=session)
+    session.incremental = False
+    DeploySqlScript('test.sql', session=session)
+    assert runs == ['test.sql'] * 3
+
+
+def test_fetch_cached_script(tmpdir, project_repo):
+    script_file = Path(project_repo.path, 'test.sql')
+    script_file.write_text('-- version:\nselect 1 from dual;\n')
+    project_repo.stage([b'test.sql'])
+    project_repo.do_commit(message=b'Create test script')
+
+    cache = ScriptCache(Path(str(tmpdir), 'cache'))
+    for folder in ('test', 'uat'):
+        target_folder = Path(str(tmpdir), folder)
+        target_folder.mkdir()
+        target_script = _fetch_script(
+            project_repo, Path('test.sql'), 'master', target_folder, cache)
+        assert target_script.read_text().startswith('-- version: ')
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cached_script_depends_on_tag(tmpdir, project_repo):
+    script_file = Path(project_repo.path, 'test.sql')
+    script_file.write_text('-- version:\nselect 1 from dual;\n')
+    project_repo.stage([b'test.sql'])
+    commit = project_repo.do_commit(message=b'Create test script')
+    project_repo.refs[b'refs/tags/v1'] = commit
+
+    cache = ScriptCache(Path(str(tmpdir), 'cache'))
+    versions = []
+    for folder, ref in (('tag', 'refs/tags/v1'), ('sha', commit.decode())):
+        target_folder = Path(str(tmpdir), folder)
+        target_folder.mkdir()
+        target_script = _fetch_script(
+            project_repo, Path('test.sql'), ref, target_folder, cache)
+        versions.append(target_script.read_text().splitlines()[0])
+    assert versions[0] == '-- version: Tag refs/tags/v1 (%s)' % (
+        commit.decode()[:7])
+    assert versions[1] == '-- version: %s' % commit.decode()[:7]
+    assert (cache.hits, cache.misses) == (0, 2)
@@ -1,5 +1,7 @@
 import matador.commands as cmd
 import globals as gbl
+from matador.management import run_command
+from matador.session import Session
 from pathlib import Path
 
 
@@ -22,3 +24,45 @@ def test_deploy_ticket(project_repo):
         Path.home(), '.matador', gbl.project, env, 'tickets', test_ticket,
         'deploy.py')
     assert checked_out_file.exists()
+
+
+def _alternates():
+    return Path(
+        Path.home(), '.matador', gbl.project, 'repository', '.git',
+        'objects', 'info', 'alternates')
+
+
+def _create_ticket(project_repo, ticket):
+    deploy_file = Path(
+        project_repo.path, 'deploy', 'tickets', ticket, 'deploy.py')
+    deploy_file.parent.mkdir(parents=True)
+    deploy_file.touch()
+    project_repo.stage([
+        bytes(str(deploy_file.relative_to(project_repo.path)), 'UTF-8')])
+    project_repo.do_commit(message=b'Create test ticket')
+
+
+def test_deploy_ticket_sharing_objects(project_repo):
+    test_ticket = 'test-ticket'
+    _create_ticket(project_repo, test_ticket)
+    cmd.DeployTicket(
+        environment='test', ticket=test_ticket, commit='HEAD',
+        share_objects=True)
+    assert Path(project_repo.path, '.git', 'objects').samefile(
+        _alternates().read_text().strip())
+
+
+def test_shared_session_sharing_objects(project_repo):
+    test_ticket = 'test-ticket'
+    _create_ticket(project_repo, test_ticket)
+
+    # A session already open, e.g. one kept by the daemon, is linked too.
+    session = Session()
+    session.update_repository()
+    assert not _alternates().exists()
+
+    run_command(
+        ['deploy-ticket', '-e', 'test', '-t', test_ticket, '-c', 'HEAD',
+         '--share-objects'], lambda: session)
+    assert Path(project_repo.path, '.git', 'objects').samefile(
+        _alternates().read_text().strip())
@@ -0,0 +1,42 @@
+import threading
+import pytest
+from matador.commands.deployment import Parallel
+from matador.commands.deployment.deployment import DeploymentCommand
+
+
+class RecordCommand(DeploymentCommand):
+
+    barrier = None
+    calls = []
+
+    def _execute(self):
+        if self.args[0] == 'fail':
+            raise ValueError('failed')
+        if self.barrier is not None:
+            self.barrier.wait(5)
+        self.calls.append(self.args[0])
+
+
+def test_parallel(session):
+    RecordCommand.calls = []
+    RecordCommand.barrier = threading.Barrier(3)
+    with session.activate(), Parallel(jobs=3) as group:
+        for name in ('a', 'b', 'c'):
+            RecordCommand(name)
+        assert RecordCommand.calls == []
+    assert sorted(RecordCommand.calls) == ['a', 'b', 'c']
+    assert len(group.timings) == 3
+
+    RecordCommand.barrier = None
+    RecordCommand('d', session=session)
+    assert RecordCommand.calls[-1] == 'd'
+
+
+def test_parallel_failure(session):
+    RecordCommand.calls = []
+    RecordCommand.barrier = None
+    with pytest.raises(ValueError):
+        with session.activate(), Parallel(jobs=2):
+            RecordCommand('fail')
+            RecordCommand('a')
+    assert RecordCommand.calls == ['a']
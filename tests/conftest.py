@@ -9,14 +9,6 @@ from matador.session import Session
 from globals import project, credentials, environments
 
 
-@pytest.fixture
-def session(request):
-
-    def finalise():
-        Session.clear()
-    request.addfinalizer(finalise)
-
-
 @pytest.fixture
 def repo(tmpdir, request):
     repo_folder = Path(str(tmpdir), project)
@@ -28,7 +20,7 @@ def repo(tmpdir, request):
 
 
 @pytest.fixture
-def project_repo(tmpdir, request, repo, session):
+def project_repo(tmpdir, request, repo):
     repo_folder = Path(repo.path)
 
     def finalise():
@@ -64,3 +56,8 @@ def project_repo(tmpdir, request, repo, session):
     chdir(str(repo_folder))
 
     return repo
+
+
+@pytest.fixture
+def session(project_repo):
+    return Session()
@@ -0,0 +1,37 @@
+"""A stand-in for sqlplus which needs no database.
+
+Echoes the text of PROMPT commands, answers SHOW ERRORS, runs the scripts
+named by @ commands and exits on EXIT, QUIT or the end of its input. A line
+reading 'fail' writes an ORA- error and a line reading 'exit on error' ends
+the process as WHENEVER SQLERROR EXIT would. A line reading 'hang' sleeps
+for a minute.
+"""
+import sys
+import time
+
+
+def run(lines):
+    for line in lines:
+        command = line.strip()
+        upper_command = command.upper()
+        if upper_command.startswith('PROMPT'):
+            print(command[7:])
+        elif upper_command.startswith('SHOW ERR'):
+            print('No errors.')
+        elif upper_command in ('EXIT', 'QUIT'):
+            sys.stdout.flush()
+            sys.exit(0)
+        elif command.startswith('@'):
+            with open(command.lstrip('@').strip('"')) as f:
+                run(f.readlines())
+        elif command == 'fail':
+            print('ORA-00942: table or view does not exist')
+        elif command == 'hang':
+            time.sleep(60)
+        elif command == 'exit on error':
+            print('ORA-00942: table or view does not exist')
+            sys.exit(1)
+        sys.stdout.flush()
+
+
+run(sys.stdin)
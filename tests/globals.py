@@ -1,9 +1,11 @@
 project = 'matador-test'
 
 environments = {
-    'test': {'dbms': 'oracle', 'connection': 'user@instance'}
+    'test': {'dbms': 'oracle', 'connection': 'user@instance'},
+    'uat': {'dbms': 'oracle', 'connection': 'user@uat_instance'}
 }
 
 credentials = {
-    'test': {'user': 'test_user', 'password': 'test_password'}
+    'test': {'user': 'test_user', 'password': 'test_password'},
+    'uat': {'user': 'uat_user', 'password': 'uat_password'}
 }
@@ -0,0 +1,99 @@
+import io
+import logging
+import os
+import threading
+import pytest
+from pathlib import Path
+from matador import daemon, management
+
+pytestmark = pytest.mark.skipif(
+    not daemon.supported(), reason='Unix domain sockets are not available')
+
+
+@pytest.fixture
+def server(tmpdir, request):
+    socket_path = Path(str(tmpdir), 'daemon.sock')
+    server = daemon.Daemon(socket_path)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    def finalise():
+        server.shutdown()
+        server.server_close()
+    request.addfinalizer(finalise)
+
+    return server
+
+
+# The daemon runs in the same process as the client in these tests, so the
+# client logs what it receives away from the 'matador' logger, which would
+# send it straight back.
+client_log = logging.getLogger('test_daemon.client')
+
+
+def test_send_command(project_repo, server, caplog):
+    socket_path = server.socket_path
+    assert server.socket_path.stat().st_mode & 0o777 == 0o600
+    exit_code = daemon.send_command(
+        ['create-ticket', '-t', 'test-ticket'], socket_path=socket_path,
+        output=io.StringIO(), log=client_log)
+    assert exit_code == 0
+    assert Path(
+        project_repo.path, 'deploy', 'tickets', 'test-ticket',
+        'deploy.py').exists()
+    assert len(server.sessions) == 1
+
+    # The session is kept warm between commands.
+    session, state = list(server.sessions.values())[0]
+    exit_code = daemon.send_command(
+        ['create-ticket', '-t', 'test-ticket-2'], socket_path=socket_path,
+        output=io.StringIO(), log=client_log)
+    assert exit_code == 0
+    assert list(server.sessions.values())[0][0] is session
+
+    output = io.StringIO()
+    exit_code = daemon.send_command(
+        ['create-ticket'], socket_path=socket_path, output=output,
+        log=client_log)
+    assert exit_code == 2
+    assert 'usage: matador create-ticket' in output.getvalue()
+
+    exit_code = daemon.send_command(
+        ['no-such-command'], socket_path=socket_path, output=io.StringIO(),
+        log=client_log)
+    assert exit_code == 1
+    assert 'KeyError' in caplog.text
+
+
+def test_not_running(tmpdir):
+    socket_path = Path(str(tmpdir), 'daemon.sock')
+    assert daemon.send_command(
+        ['create-ticket'], socket_path=socket_path) is None
+
+
+def test_client_environment(server, monkeypatch):
+    environments = []
+
+    def run_command(argv, session=None):
+        environments.append(dict(os.environ))
+
+    monkeypatch.setattr(management, 'run_command', run_command)
+    monkeypatch.setenv('ORACLE_HOME', '/daemon/oracle')
+
+    exit_code = server.run({
+        'argv': ['create-ticket'],
+        'cwd': os.getcwd(),
+        'env': {'ORACLE_HOME': '/client/oracle'},
+    }, lambda message: None)
+    assert exit_code == 0
+    assert environments == [{'ORACLE_HOME': '/client/oracle'}]
+    assert os.environ['ORACLE_HOME'] == '/daemon/oracle'
+
+
+def test_stream_handler_client_gone():
+    def closed(message):
+        raise ValueError('I/O operation on closed file')
+
+    daemon._StreamHandler(closed).emit(
+        logging.makeLogRecord({'msg': 'lost'}))
@@ -0,0 +1,217 @@
+import sys
+import logging
+import sqlite3
+from pathlib import Path
+from matador import executors, sqlplus
+
+fake_sqlplus = [
+    sys.executable, str(Path(Path(__file__).parent, 'fake_sqlplus.py'))]
+
+script = """\
+-- A test script
+SET DEFINE OFF
+PROMPT Creating table
+create table test_table (
+    id integer,
+    description varchar(100)
+);
+
+insert into test_table values (1, 'first; with a semicolon');
+insert into test_table values (2, 'second') ; -- trailing comment
+insert into test_table values (3); insert into test_table values (4);
+/* a comment; spanning
+   lines */
+set transaction read only;
+CREATE OR REPLACE PACKAGE BODY test_package AS
+    PROCEDURE test IS
+    BEGIN
+        NULL;
+    END;
+END;
+/
+exec test_package.test(1);
+/
+select * from test_table"""
+
+
+def test_split_statements():
+    statements = list(executors.split_statements(
+        script.splitlines(keepends=True)))
+    assert statements == [
+        'create table test_table (\n    id integer,\n'
+        '    description varchar(100)\n)',
+        "insert into test_table values (1, 'first; with a semicolon')",
+        "insert into test_table values (2, 'second')",
+        'insert into test_table values (3)',
+        'insert into test_table values (4)',
+        'set transaction read only',
+        'CREATE OR REPLACE PACKAGE BODY test_package AS\n'
+        '    PROCEDURE test IS\n    BEGIN\n        NULL;\n    END;\nEND;',
+        'BEGIN test_package.test(1); END;',
+    ]
+
+
+def test_split_statements_ended_by_slash():
+    statements = list(executors.split_statements([
+        'create table test_table (id integer)\n',
+        '/\n',
+        'insert into test_table\n',
+        'values (1)\n',
+        '/\n',
+        'select 1 from dual;\n',
+        '/\n',
+        'select 2 from dual\n',
+        '/\n']))
+    assert statements == [
+        'create table test_table (id integer)',
+        'insert into test_table\nvalues (1)',
+        'select 1 from dual',
+        'select 2 from dual',
+    ]
+
+
+def test_sqlite_executor(tmpdir):
+    database = str(Path(str(tmpdir), 'test.db'))
+    script_file = Path(str(tmpdir), 'test.sql')
+    script_file.write_text(
+        "create table test_table (id integer);\n"
+        "insert into test_table values (1);\n"
+        "insert into missing_table values (1);\n"
+        "insert into test_table values (2);\n")
+    environment = {'dbms': 'sqlite', 'connection': database}
+
+    executor = executors.executor(environment, {})
+    assert isinstance(executor, executors.DbApiExecutor)
+    executor.run(script_file)
+    executors.close_all()
+
+    connection = sqlite3.connect(database)
+    rows = connection.execute('select id from test_table').fetchall()
+    assert rows == [(1,), (2,)]
+
+
+def test_connection_pool(tmpdir):
+    database = str(Path(str(tmpdir), 'test.db'))
+    environment = {'dbms': 'sqlite', 'connection': database}
+    pool = executors.executor(environment, {}).pool
+    assert executors.executor(environment, {}).pool is pool
+
+    connection = pool.acquire()
+    other_connection = pool.acquire()
+    assert other_connection is not connection
+    pool.release(connection)
+    pool.release(other_connection)
+    assert pool.acquire() is other_connection
+    executors.close_all()
+    assert executors.executor(environment, {}).pool is not pool
+    executors.close_all()
+
+
+def test_oracle_executor():
+    environment = {'dbms': 'oracle', 'connection': 'instance'}
+    executor = executors.executor(environment, {}, True)
+    assert isinstance(executor, executors.SqlPlusExecutor)
+    assert executor.reuse_sessions
+
+
+def test_sqlplus_executor(tmpdir, caplog):
+    caplog.set_level(logging.INFO, logger='matador')
+    environment = {
+        'dbms': 'oracle', 'connection': 'instance',
+        'sqlplus': fake_sqlplus}
+    credentials = {'user': 'user', 'password': 'password'}
+    script_file = Path(str(tmpdir), 'test.sql')
+
+    script_file.write_text('PROMPT first\nPROMPT second\n')
+    result = executors.executor(environment, credentials).run(script_file)
+    assert result.succeeded
+    assert result.exit_code == 0
+    assert result.duration > 0
+    messages = [record.getMessage() for record in caplog.records]
+    assert messages[:3] == ['first', 'second', 'No errors.']
+
+    script_file.write_text('fail\nPROMPT after error\n')
+    result = executors.executor(environment, credentials).run(script_file)
+    assert not result.succeeded
+    assert result.errors == ['ORA-00942: table or view does not exist']
+
+    result = executors.executor(
+        environment, credentials, fail_fast=True).run(script_file)
+    assert result.exit_code != 0
+
+    script_file.write_text('hang\n')
+    result = executors.executor(
+        environment, credentials, timeout=0.5).run(script_file)
+    assert result.errors == ['Timed out after 0.5 seconds']
+
+
+def test_sqlite_executor_errors(tmpdir):
+    database = str(Path(str(tmpdir), 'test.db'))
+    script_file = Path(str(tmpdir), 'test.sql')
+    script_file.write_text(
+        "create table test_table (id integer);\n"
+        "insert into missing_table values (1);\n"
+        "insert into test_table values (1);\n")
+    environment = {'dbms': 'sqlite', 'connection': database}
+
+    result = executors.executor(
+        environment, {}, fail_fast=True).run(script_file)
+    executors.close_all()
+
+    assert result.exit_code == 1
+    assert result.errors == [
+        'OperationalError: no such table: missing_table']
+    connection = sqlite3.connect(database)
+    rows = connection.execute('select id from test_table').fetchall()
+    assert rows == []
+
+
+def test_script_chunks(tmpdir):
+    script_file = Path(str(tmpdir), 'test.sql')
+    content = b'insert into test_table values (1);\n' * 5000
+    script_file.write_bytes(content)
+
+    chunks = list(executors._script_chunks(script_file, b'\nshow error\n'))
+
+    assert all(len(chunk) <= executors.CHUNK_SIZE for chunk in chunks)
+    assert len(chunks) > 2
+    assert chunks[-1] == b'\nshow error\n'
+    assert b''.join(chunks[:-1]) == content
+
+
+def test_session_limit():
+    environment = {'dbms': 'sqlite', 'connection': ':memory:'}
+    assert executors.session_limit(environment) is None
+
+    limit = executors.session_limit(environment, 2)
+    assert executors.session_limit(
+        dict(environment, max_sessions=2)) is limit
+    assert executors.executor(environment, None, max_sessions=2).limit is limit
+
+
+def test_sqlplus_executor_reusing_sessions(tmpdir):
+    environment = {
+        'dbms': 'oracle', 'connection': 'instance',
+        'sqlplus': fake_sqlplus}
+    credentials = {'user': 'user', 'password': 'password'}
+    executor = executors.executor(environment, credentials, True, timeout=2)
+    try:
+        # Scripts in different folders share the connection's session.
+        for folder in ('ticket-1', 'ticket-2'):
+            script_file = Path(str(tmpdir), folder, 'test.sql')
+            script_file.parent.mkdir()
+            script_file.write_text('PROMPT %s\n' % folder)
+            assert executor.run(script_file).succeeded
+        assert sum(len(s) for s in sqlplus._idle_sessions.values()) == 1
+
+        # A script which exits cleanly has succeeded.
+        script_file.write_text('PROMPT done\nEXIT\n')
+        result = executor.run(script_file)
+        assert result.succeeded
+        assert result.exit_code == 0
+
+        script_file.write_text('hang\n')
+        result = executor.run(script_file)
+        assert result.errors == ['Timed out after 2 seconds']
+    finally:
+        executors.close_all()
@@ -1,3 +1,7 @@
+import gc
+import io
+import weakref
+import pytest
 from matador import git
 from pathlib import Path
 from time import strftime, gmtime
@@ -44,6 +48,60 @@ def test_fetch_all(tmpdir, project_repo):
     assert target_repo.refs[b'refs/heads/master'] == ref
 
 
+def test_fetch_all_unchanged(tmpdir, project_repo, monkeypatch):
+    target_repo_folder = Path(str(tmpdir), 'test_remote')
+    target_repo = Repo.init(str(target_repo_folder), mkdir=True)
+    git.fetch_all(project_repo, target_repo)
+
+    def fail(*args, **kwargs):
+        raise AssertionError('Unexpected fetch')
+
+    monkeypatch.setattr(git.LocalGitClient, 'fetch', fail)
+    monkeypatch.setattr(project_repo, 'get_refs', fail)
+    git.fetch_all(project_repo, target_repo)
+
+
+def test_fetch_all_changed(tmpdir, project_repo):
+    target_repo_folder = Path(str(tmpdir), 'test_remote')
+    target_repo = Repo.init(str(target_repo_folder), mkdir=True)
+    git.fetch_all(project_repo, target_repo)
+    tag = target_repo.refs[b'refs/tags/test-tag']
+
+    test_file = Path(project_repo.path, 'test_file')
+    test_file.touch()
+    project_repo.stage([b'test_file'])
+    ref = project_repo.do_commit(message=b'Test commit')
+
+    git.fetch_all(project_repo, target_repo)
+
+    assert target_repo.refs[b'refs/remotes/origin/master'] == ref
+    assert target_repo.refs[b'refs/heads/master'] == ref
+    assert target_repo.refs[b'refs/tags/test-tag'] == tag
+    assert ref in target_repo.object_store
+
+
+def test_fetch_all_ignores_source_head(tmpdir, project_repo):
+    target_repo_folder = Path(str(tmpdir), 'test_remote')
+    target_repo = Repo.init(str(target_repo_folder), mkdir=True)
+    master = project_repo.head()
+    git.fetch_all(project_repo, target_repo)
+
+    # The project checks out another branch with a commit of its own.
+    test_file = Path(project_repo.path, 'test_file')
+    test_file.touch()
+    project_repo.stage([b'test_file'])
+    feature = project_repo.do_commit(message=b'Feature commit')
+    project_repo.refs[b'refs/heads/master'] = master
+    project_repo.refs[b'refs/heads/feature'] = feature
+    project_repo.refs.set_symbolic_ref(b'HEAD', b'refs/heads/feature')
+
+    git.fetch_all(project_repo, target_repo)
+
+    assert target_repo.refs[b'refs/heads/master'] == master
+    assert target_repo.refs[b'refs/heads/feature'] == feature
+    assert target_repo.head() == master
+
+
 def test_full_ref_commit(project_repo):
     head = project_repo.head().decode(encoding='ascii')
     ref = git.full_ref(project_repo, head)
@@ -61,6 +119,44 @@ def test_full_ref_tag(project_repo):
     assert ref == 'refs/tags/test-tag'
 
 
+def test_ref_index(project_repo):
+    head = project_repo.head()
+    index = git.ref_index(project_repo)
+    assert git.ref_index(project_repo) is index
+    assert index.full_ref('master') == 'refs/heads/master'
+    assert index.full_ref('test-tag') == 'refs/tags/test-tag'
+    assert index.resolve('master') == head
+    assert index.resolve('refs/tags/test-tag') == head
+    assert index.resolve('HEAD') == head
+    assert index.resolve(head.decode(encoding='ascii')) == head
+    assert index.resolve(head[:7].decode(encoding='ascii')) == head
+    with pytest.raises(KeyError):
+        index.resolve('test-garbage')
+
+    blob = project_repo.object_store[
+        project_repo[head].tree].items()[0].sha.decode(encoding='ascii')
+    with pytest.raises(ValueError):
+        index.resolve(blob[:7])
+
+    git.commit(project_repo, 'Empty commit')
+    assert git.ref_index(project_repo) is not index
+    assert git.resolve_commit(project_repo, 'master') == project_repo.head()
+
+
+def test_caches_released_with_repo(project_repo):
+    repo = Repo(project_repo.path)
+    git.resolve_commit(repo, 'master')
+    assert repo in git._ref_indexes
+    assert repo in git._object_caches
+
+    # Nothing cached for the repository keeps it, and so its entries in
+    # the caches, alive.
+    repo_ref = weakref.ref(repo)
+    del repo
+    gc.collect()
+    assert repo_ref() is None
+
+
 def test_checkout(project_repo):
     creds_file = Path(project_repo.path, 'config', 'credentials.yml')
     creds_file.unlink()
@@ -105,3 +201,123 @@ def test_substitute_keywords(project_repo):
     result = git.substitute_keywords(test_text, project_repo, 'test-garbage')
     expected_result = ''
     assert result == expected_result
+
+
+def test_export_tree(tmpdir, project_repo):
+    repo_folder = Path(project_repo.path)
+    ticket_folder = Path(repo_folder, 'deploy', 'tickets', 'test-ticket')
+    ticket_folder.mkdir(parents=True)
+    deploy_file = Path(ticket_folder, 'deploy.py')
+    deploy_file.write_text('# deploy\n')
+    project_repo.stage([
+        bytes(str(deploy_file.relative_to(repo_folder)), encoding='UTF-8')])
+    project_repo.do_commit(message=b'Create test ticket')
+    creds_file = Path(repo_folder, 'config', 'credentials.yml')
+    creds_file.unlink()
+
+    target_folder = Path(str(tmpdir), 'export')
+    git.export_tree(
+        project_repo, 'master', 'deploy/tickets/test-ticket', target_folder)
+
+    assert Path(target_folder, 'deploy.py').read_text() == '# deploy\n'
+    assert not Path(target_folder, 'config').exists()
+    assert not creds_file.exists()
+
+
+def test_resolve_commit(project_repo):
+    head = project_repo.head()
+    assert git.resolve_commit(project_repo) == head
+    assert git.resolve_commit(project_repo, 'master') == head
+    assert git.resolve_commit(project_repo, 'test-tag') == head
+
+
+def test_lookup_blob(project_repo):
+    creds_file = Path(project_repo.path, 'config', 'credentials.yml')
+    expected = creds_file.read_bytes()
+    creds_file.unlink()
+
+    blob = git.lookup_blob(project_repo, 'master', 'config/credentials.yml')
+
+    assert blob.as_raw_string() == expected
+    assert not creds_file.exists()
+
+
+def test_blob_id(project_repo):
+    envs_file = Path(project_repo.path, 'config', 'environments.yml')
+    blob = git.lookup_blob(project_repo, 'master', 'config/environments.yml')
+    assert git.blob_id(envs_file) == blob.id.decode(encoding='ascii')
+
+
+def test_export_subtrees(tmpdir, project_repo):
+    repo_folder = Path(project_repo.path)
+    for ticket in ['ticket-1', 'ticket-2', 'ticket-3']:
+        deploy_file = Path(
+            repo_folder, 'deploy', 'tickets', ticket, 'deploy.py')
+        deploy_file.parent.mkdir(parents=True)
+        deploy_file.write_text('# %s\n' % ticket)
+        deploy_path = str(deploy_file.relative_to(repo_folder))
+        project_repo.stage([bytes(deploy_path, encoding='UTF-8')])
+    project_repo.do_commit(message=b'Create test tickets')
+
+    target_folder = Path(str(tmpdir), 'export')
+    git.export_subtrees(
+        project_repo, 'master', 'deploy/tickets', ['ticket-1', 'ticket-3'],
+        target_folder)
+
+    assert Path(target_folder, 'ticket-1', 'deploy.py').read_text() == (
+        '# ticket-1\n')
+    assert Path(target_folder, 'ticket-3', 'deploy.py').exists()
+    assert not Path(target_folder, 'ticket-2').exists()
+
+
+def test_share_objects(tmpdir, project_repo, monkeypatch):
+    target_repo_folder = Path(str(tmpdir), 'test_remote')
+    target_repo = Repo.init(str(target_repo_folder), mkdir=True)
+
+    assert git.share_objects(project_repo, target_repo)
+
+    def fail(*args, **kwargs):
+        raise AssertionError('Unexpected object transfer')
+
+    monkeypatch.setattr(git.LocalGitClient, 'fetch', fail)
+    git.fetch_all(project_repo, target_repo)
+
+    ref = project_repo.head()
+    reopened_repo = Repo(str(target_repo_folder))
+    assert reopened_repo.refs[b'refs/heads/master'] == ref
+    assert reopened_repo[ref].id == ref
+
+
+def test_write_substituted(project_repo):
+    short_ref = project_repo.head()[:7]
+    chunks = [b'First line\r\n-- vers', b'ion: old\r', b'\nLast line']
+    target_file = io.BytesIO()
+
+    git.write_substituted(chunks, target_file, project_repo, 'master')
+
+    assert target_file.getvalue() == (
+        b'First line\r\n-- version: ' + short_ref + b'\r\nLast line')
+
+
+def test_object_cache(project_repo):
+    head = project_repo.head()
+    tree_id = project_repo[head].tree
+    cache = git.ObjectCache(project_repo.object_store)
+
+    assert cache[head].id == head
+    assert cache[head].id == head
+    assert cache[tree_id].id == tree_id
+    assert cache.commit_metadata(head) == cache.commit_metadata(head)
+    stats = cache.stats()
+    assert stats['hits'] == 2
+    assert stats['misses'] == 2
+    assert stats['metadata_hits'] == 1
+    assert stats['metadata_misses'] == 1
+
+    cache = git.ObjectCache(
+        project_repo.object_store, project_repo[head].raw_length())
+    cache[head]
+    cache[tree_id]
+    cache[head]
+    assert cache.stats()['objects'] == 1
+    assert cache.stats()['misses'] == 3
@@ -0,0 +1,36 @@
+from pathlib import Path
+from matador.journal import Journal
+
+
+def test_journal(tmpdir):
+    path = Path(str(tmpdir), 'package.jsonl')
+    journal = Journal(path)
+    assert not journal.resumable
+
+    journal.start('package', 'a' * 40)
+    journal.ticket_started('A001')
+    journal.script_finished('A001', 'one.sql', True)
+    journal.ticket_finished('A001', True)
+    journal.ticket_started('A002')
+    journal.script_finished('A002', 'one.sql', True)
+    journal.script_finished('A002', 'two.sql', False)
+    # A process killed while writing leaves a partial entry.
+    with path.open('a') as f:
+        f.write('{"event": "ticket-fin')
+        f.close()
+
+    journal = Journal(path)
+    assert journal.resumable
+    assert journal.commit_id == 'a' * 40
+    assert journal.tickets_done == {'A001'}
+    assert journal.script_done('A002', 'one.sql')
+    assert not journal.script_done('A002', 'one.sql')
+    assert not journal.script_done('A002', 'two.sql')
+
+    journal.resume()
+    journal.finish()
+    assert not Journal(path).resumable
+
+    journal.start('package', 'b' * 40)
+    assert journal.tickets_done == set()
+    assert Journal(path).commit_id == 'b' * 40
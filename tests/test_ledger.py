@@ -0,0 +1,43 @@
+from pathlib import Path
+from matador.executors import ScriptResult
+from matador.ledger import Ledger, ledger
+
+
+def test_ledger(tmpdir):
+    path = Path(str(tmpdir), 'ledger.sqlite')
+    records = Ledger(path)
+    assert not records.applied('src/test.sql', 'a' * 40)
+
+    records.record(
+        'src/test.sql', 'a' * 40, 'A001', 'c' * 40,
+        ScriptResult(1, ['ORA-00942'], 0.5))
+    assert not records.applied('src/test.sql', 'a' * 40)
+
+    records.record(
+        'src/test.sql', 'a' * 40, 'A001', 'c' * 40, ScriptResult(0, [], 0.5))
+    assert records.applied('src/test.sql', 'a' * 40)
+    assert not records.applied('src/test.sql', 'b' * 40)
+    assert not records.applied('src/other.sql', 'a' * 40)
+
+    records.record(
+        'src/test.sql', 'b' * 40, 'A002', 'd' * 40, ScriptResult(0, [], 0.5))
+    assert not records.applied('src/test.sql', 'a' * 40)
+    records.close()
+
+    history = Ledger(path).history('src/test.sql')
+    assert [(sha[0], ticket, succeeded) for
+            sha, ticket, commit_id, applied, duration, succeeded in history
+            ] == [('a', 'A001', False), ('a', 'A001', True),
+                  ('b', 'A002', True)]
+
+
+def test_shared_ledger(tmpdir):
+    path = Path(str(tmpdir), 'ledger.sqlite')
+    assert ledger(path) is ledger(path)
+    opened = ledger(path)
+    path.unlink()
+    reopened = ledger(path)
+    assert reopened is not opened
+    reopened.record(
+        'src/test.sql', 'a' * 40, 'A001', 'c' * 40, ScriptResult(0, [], 0.5))
+    assert reopened.applied('src/test.sql', 'a' * 40)
@@ -0,0 +1,68 @@
+import subprocess
+import sys
+import time
+import pytest
+from pathlib import Path
+import matador.commands as cmd
+from matador.commands import CommandRegistry
+from matador.commands.create import CreateTicket
+
+# The most time 'matador --help' may take, allowing for slow test machines.
+HELP_BUDGET = 2.0
+
+HEAVY_MODULES = ('yaml', 'dulwich', 'matador.session')
+
+
+def test_help_imports_no_commands():
+    script = (
+        'import sys\n'
+        'from matador.management import execute_command\n'
+        'try:\n'
+        '    execute_command()\n'
+        'except SystemExit:\n'
+        '    pass\n'
+        'print(",".join(m for m in %r if m in sys.modules))\n'
+        % (HEAVY_MODULES,))
+    start = time.monotonic()
+    result = subprocess.run(
+        [sys.executable, '-c', script, '--help'],
+        cwd=str(Path(__file__).parents[1]), stdout=subprocess.PIPE,
+        universal_newlines=True, check=True)
+    elapsed = time.monotonic() - start
+    assert 'Change management for Agresso systems' in result.stdout
+    assert result.stdout.splitlines()[-1] == ''
+    assert elapsed < HELP_BUDGET
+
+
+def test_registry_imports_lazily():
+    registry = CommandRegistry({
+        'create-ticket': 'matador.commands.create:CreateTicket'})
+    assert 'create-ticket' in registry
+    assert 'deploy-ticket' not in registry
+    assert registry['create-ticket'] is CreateTicket
+    with pytest.raises(KeyError):
+        registry['deploy-ticket']
+
+    registry.register('missing', 'matador.commands.create:Missing')
+    with pytest.raises(AttributeError):
+        registry['missing']
+
+
+def test_registry_entry_points(monkeypatch):
+    class EntryPoint(object):
+        name = 'plugin'
+
+        def load(self):
+            return CreateTicket
+
+    monkeypatch.setattr(
+        'matador.commands._entry_points', lambda: [EntryPoint()])
+    registry = CommandRegistry({})
+    assert list(registry) == ['plugin']
+    assert registry['plugin'] is CreateTicket
+
+
+def test_command_attributes():
+    assert cmd.CreateTicket is CreateTicket
+    with pytest.raises(AttributeError):
+        cmd.Missing
@@ -0,0 +1,56 @@
+import threading
+import time
+import pytest
+from matador.scheduler import run_graph
+
+
+def test_run_graph_order():
+    order = []
+    dependencies = {'b': ['a'], 'c': ['a'], 'd': ['b', 'c']}
+
+    run_graph(['a', 'b', 'c', 'd'], dependencies, order.append, jobs=2)
+
+    assert order[0] == 'a'
+    assert set(order[1:3]) == {'b', 'c'}
+    assert order[3] == 'd'
+
+
+def test_run_graph_concurrency():
+    barrier = threading.Barrier(3, timeout=5)
+    run_graph(['a', 'b', 'c'], {}, lambda node: barrier.wait(), jobs=3)
+
+
+def test_run_graph_sequential():
+    order = []
+    active = []
+
+    def record(node):
+        active.append(node)
+        assert len(active) == 1
+        time.sleep(0.01)
+        order.append(node)
+        active.remove(node)
+
+    run_graph(['a', 'b', 'c'], {}, record, jobs=1)
+    assert order == ['a', 'b', 'c']
+
+
+def test_run_graph_failure():
+    order = []
+
+    def fail_on_b(node):
+        if node == 'b':
+            raise RuntimeError(node)
+        order.append(node)
+
+    with pytest.raises(RuntimeError):
+        run_graph(
+            ['a', 'b', 'c'], {'b': ['a'], 'c': ['b']}, fail_on_b, jobs=2)
+    assert order == ['a']
+
+
+def test_run_graph_invalid():
+    with pytest.raises(ValueError):
+        run_graph(['a'], {'a': ['z']}, lambda node: None)
+    with pytest.raises(ValueError):
+        run_graph(['a', 'b'], {'a': ['b'], 'b': ['a']}, lambda node: None)
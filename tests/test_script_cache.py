@@ -0,0 +1,53 @@
+import os
+from pathlib import Path
+from matador.script_cache import ScriptCache
+
+
+def test_script_cache(tmpdir):
+    cache = ScriptCache(Path(str(tmpdir), 'cache'))
+    source = Path(str(tmpdir), 'source.sql')
+    target = Path(str(tmpdir), 'target.sql')
+    source.write_text('select 1 from dual;\n')
+
+    assert not cache.fetch('a' * 40, 'c' * 40, target)
+    cache.store('a' * 40, 'c' * 40, source)
+    assert cache.fetch('a' * 40, 'c' * 40, target)
+    assert target.read_text() == 'select 1 from dual;\n'
+    assert not cache.fetch('a' * 40, 'd' * 40, target)
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert cache.stats() == {
+        'files': 1, 'size': 20, 'max_size': cache.max_size}
+
+
+def test_script_cache_store_again(tmpdir):
+    cache = ScriptCache(Path(str(tmpdir), 'cache'))
+    source = Path(str(tmpdir), 'source.sql')
+    source.write_text('x' * 20)
+
+    cache.store('a' * 40, 'c' * 40, source)
+    cache.store('b' * 40, 'c' * 40, source)
+    source.write_text('x' * 30)
+    cache.store('a' * 40, 'c' * 40, source)
+    assert cache._size == 50
+
+
+def test_script_cache_eviction(tmpdir):
+    cache = ScriptCache(Path(str(tmpdir), 'cache'))
+    cache.max_size = 50
+    assert ScriptCache(cache.folder).max_size == 50
+
+    source = Path(str(tmpdir), 'source.sql')
+    source.write_text('x' * 20)
+    for number, blob_id in enumerate(['a' * 40, 'b' * 40]):
+        cache.store(blob_id, 'c' * 40, source)
+        path = cache._path(blob_id, 'c' * 40)
+        os.utime(str(path), (number, number))
+
+    # Using the older script makes it the most recently used.
+    cache.fetch('a' * 40, 'c' * 40, Path(str(tmpdir), 'target.sql'))
+    cache.store('e' * 40, 'c' * 40, source)
+    assert cache.stats()['files'] == 2
+    assert not cache._path('b' * 40, 'c' * 40).exists()
+
+    assert cache.prune(0) == 2
+    assert cache.stats()['files'] == 0
@@ -1,3 +1,4 @@
+import pytest
 from dulwich.repo import Repo
 from dulwich.client import LocalGitClient
 from pathlib import Path
@@ -6,37 +7,68 @@ from globals import project, credentials, environments
 
 
 def test_initialise(project_repo):
-    Session.initialise()
-    assert Session.project_folder == Path(project_repo.path)
-    assert Session.project == project
-    assert Session.matador_project_folder == Path(
+    session = Session()
+    assert session.project_folder == Path(project_repo.path)
+    assert session.project == project
+    assert session.matador_project_folder == Path(
         Path.home(), '.matador', project)
-    assert Session.matador_repository_folder == Path(
+    assert session.matador_repository_folder == Path(
         Path.home(), '.matador', project, 'repository')
-    assert Session.environments == environments
+    assert session.environments == environments
 
 
 def test_set_environment(project_repo):
     env = 'test'
-    Session.set_environment(env)
-    config = Repo(str(Session.matador_repository_folder)).get_config()
+    session = Session(env)
+    config = Repo(str(session.matador_repository_folder)).get_config()
     assert config.get(b'core', b'sparsecheckout') == b'true'
-    assert Session.matador_project_folder.is_dir()
-    assert Session.matador_repository_folder.is_dir()
-    assert Session.environment == environments[env]
-    assert Session.credentials == credentials[env]
-    assert Session.matador_environment_folder == Path(
+    assert session.matador_project_folder.is_dir()
+    assert session.matador_repository_folder.is_dir()
+    assert session.environment == environments[env]
+    assert session.credentials == credentials[env]
+    assert session.matador_environment_folder == Path(
         Path.home(), '.matador', project, env)
-    assert Session.matador_tickets_folder == Path(
+    assert session.matador_tickets_folder == Path(
         Path.home(), '.matador', project, env, 'tickets')
-    assert Session.matador_packages_folder == Path(
+    assert session.matador_packages_folder == Path(
         Path.home(), '.matador', project, env, 'packages')
-    assert Session.matador_environment_folder.is_dir()
-    assert Session.matador_tickets_folder.is_dir()
-    assert Session.matador_packages_folder.is_dir()
+    assert session.matador_environment_folder.is_dir()
+    assert session.matador_tickets_folder.is_dir()
+    assert session.matador_packages_folder.is_dir()
 
 
 def test_update_repository(project_repo):
-    Session.update_repository()
-    refs = LocalGitClient().get_refs(str(Session.matador_repository_folder))
+    session = Session()
+    session.update_repository()
+    refs = LocalGitClient().get_refs(str(session.matador_repository_folder))
     assert b'refs/remotes/origin/master' in refs
+
+
+def test_share_objects(project_repo):
+    session = Session(share_objects=True)
+    session.update_repository()
+    object_store = session.matador_repo.object_store
+    assert project_repo.head() in object_store
+    objects_folder = Path(object_store.path)
+    assert sorted(f.name for f in objects_folder.iterdir()) == ['info', 'pack']
+
+
+def test_for_environment(project_repo):
+    session = Session()
+    session.update_repository()
+    session.fail_fast = True
+    test_session = session.for_environment('test')
+    assert session.environment is None
+    assert test_session.environment == environments['test']
+    assert test_session.matador_repo is session.matador_repo
+    assert test_session.fail_fast
+
+
+def test_current(project_repo):
+    session = Session()
+    with pytest.raises(RuntimeError):
+        Session.current()
+    with session.activate():
+        assert Session.current() is session
+    with pytest.raises(RuntimeError):
+        Session.current()
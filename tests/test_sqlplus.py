@@ -0,0 +1,82 @@
+import sys
+import time
+import logging
+import pytest
+from pathlib import Path
+from matador import sqlplus
+
+fake_sqlplus = [
+    sys.executable, str(Path(Path(__file__).parent, 'fake_sqlplus.py')),
+    '-S', '-L', 'user/password@instance']
+
+
+@pytest.fixture
+def sessions(request):
+    request.addfinalizer(sqlplus.close_sessions)
+
+
+def test_session_run(caplog):
+    caplog.set_level(logging.INFO, logger='matador')
+    session = sqlplus.SqlPlusSession(fake_sqlplus)
+    session.run([b'PROMPT first script\nshow error'])
+    session.run([b'PROMPT second script'])
+    session.close()
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert messages == ['first script', 'No errors.', 'second script']
+    assert not session.alive
+
+
+def test_session_exit():
+    session = sqlplus.SqlPlusSession(fake_sqlplus)
+    with pytest.raises(sqlplus.SessionClosed):
+        session.run([b'exit on error\nPROMPT never reached'])
+    assert not session.alive
+
+
+def test_session_reuse(sessions):
+    session = sqlplus.acquire_session(fake_sqlplus)
+    session.run([b'PROMPT first script'])
+    sqlplus.release_session(session)
+
+    assert sqlplus.acquire_session(fake_sqlplus) is session
+    other_session = sqlplus.acquire_session(fake_sqlplus)
+    assert other_session is not session
+    other_session.close()
+    sqlplus.release_session(session)
+
+    sqlplus.run_script(fake_sqlplus, [b'PROMPT second script'])
+    assert sqlplus.acquire_session(fake_sqlplus) is session
+    sqlplus.release_session(session)
+
+    sqlplus.close_sessions()
+    assert not session.alive
+
+
+def test_session_errors():
+    session = sqlplus.SqlPlusSession(fake_sqlplus)
+    errors = session.run([b'fail\nPROMPT still running'])
+    assert errors == ['ORA-00942: table or view does not exist']
+
+    with pytest.raises(sqlplus.SessionClosed) as e:
+        session.run([b'fail\nPROMPT never reached'], fail_fast=True)
+    assert e.value.errors == ['ORA-00942: table or view does not exist']
+    assert not session.alive
+
+
+def test_session_timeout():
+    session = sqlplus.SqlPlusSession(fake_sqlplus)
+    with pytest.raises(sqlplus.SessionClosed):
+        session.run([b'hang'], timeout=0.5)
+    assert not session.alive
+
+
+def test_session_timeout_while_writing():
+    # sqlplus stalls before reading all of a script too long for the pipe.
+    script = [b'hang\n', b'PROMPT padding\n' * 100000]
+    session = sqlplus.SqlPlusSession(fake_sqlplus)
+    start = time.monotonic()
+    with pytest.raises(sqlplus.SessionClosed):
+        session.run(script, timeout=0.5)
+    assert time.monotonic() - start < 10
+    assert not session.alive